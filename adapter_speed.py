@@ -0,0 +1,199 @@
+"""Adapter Speed Tuner - Finds and caches the fastest reliable adapter clock"""
+
+import json
+import os
+import tempfile
+import time
+from output import out
+from devices import get_device
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".openocd_automation", "adapter_speed.json")
+
+# Clock steps tried during calibration (kHz), slowest first
+SPEED_LADDER_KHZ = [480, 1000, 1800, 4000, 8000, 15000, 24000]
+
+
+class AdapterSpeedCache:
+    """Per-probe cache of calibrated adapter speeds, stored as JSON"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+
+    def _load(self):
+        """Load the cache file, returning an empty cache if it is missing or corrupt"""
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, serial, target_cfg):
+        """Get the cached speed for a probe and target
+
+        Returns:
+            int: Speed in kHz, or None if the probe was never calibrated
+        """
+        entry = self._load().get(serial, {}).get(target_cfg)
+        return entry['speed_khz'] if entry else None
+
+    def store(self, serial, target_cfg, speed_khz):
+        """Store a calibrated speed for a probe and target"""
+        data = self._load()
+        data.setdefault(serial, {})[target_cfg] = {
+            'speed_khz': speed_khz,
+            'calibrated': time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write to a temp file first so an interrupted run never corrupts the cache
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class AdapterSpeedTuner:
+    """Calibrate the adapter clock with RAM write/read-back test patterns"""
+
+    def __init__(self, manager, cache=None, ladder=None, trials=3, pattern_size=4096):
+        """
+        Args:
+            manager: Connected OpenOCDManager instance
+            cache: AdapterSpeedCache instance (default: cache in the user's home)
+            ladder: Clock steps to try in kHz, slowest first
+            trials: Consecutive passing transfers required at each step
+            pattern_size: Test pattern size in bytes (limited by the target RAM)
+        """
+        self.manager = manager
+        self.cache = cache or AdapterSpeedCache()
+        self.ladder = ladder or SPEED_LADDER_KHZ
+        self.trials = trials
+        self.pattern_size = pattern_size
+
+    def apply_cached(self):
+        """Apply the cached speed for the connected probe, if any
+
+        Returns:
+            int: Applied speed in kHz, or None if nothing was cached
+        """
+        serial = self.manager.get_probe_serial()
+        if serial is None:
+            # Probes without a known serial would all share one entry
+            out.warning("Probe serial unknown, cached adapter speed not applied (use --probe-serial)")
+            return None
+        speed = self.cache.get(serial, self.manager.target_cfg)
+        if speed is None:
+            return None
+
+        try:
+            actual = self.manager.set_adapter_speed(speed)
+        except RuntimeError as e:
+            out.warning(f"Could not apply cached adapter speed: {e}")
+            return None
+        out.success(f"Applied cached adapter speed for probe {serial}: {actual or speed} kHz")
+        return actual or speed
+
+    def calibrate(self):
+        """Ramp the adapter clock up until transfers fail, then back off
+
+        Returns:
+            int: Fastest reliable speed in kHz, or None if no speed passed
+        """
+        device = get_device(self.manager.target_cfg)
+        if not device:
+            out.error(f"No memory layout known for {self.manager.target_cfg}, cannot calibrate")
+            return None
+
+        size = min(self.pattern_size, device['ram_size'])
+        address = device['ram_start']
+        serial = self.manager.get_probe_serial()
+        if serial is None:
+            out.warning("Probe serial unknown, the calibrated speed will not be cached (use --probe-serial)")
+        out.info(f"Calibrating adapter speed for probe {serial or '(unknown)'} "
+                 f"({size} byte pattern at 0x{address:08x})...")
+
+        # The test pattern overwrites RAM, so the core must not be running
+        self.manager.halt()
+
+        passed = []
+        for speed in self.ladder:
+            if self._test_speed(speed, address, size):
+                passed.append(speed)
+            else:
+                break
+
+        # Back off: after a failure the link may need a slower clock to
+        # recover, so re-confirm the passing steps from the fastest down
+        ramp_failed = len(passed) < len(self.ladder)
+        for speed in reversed(passed):
+            if ramp_failed and not self._test_speed(speed, address, size):
+                continue
+
+            actual = self.manager.set_adapter_speed(speed) or speed
+            if serial is None:
+                out.success(f"Fastest reliable adapter speed: {actual} kHz (not cached)")
+                return actual
+            self.cache.store(serial, self.manager.target_cfg, actual)
+            out.success(f"Fastest reliable adapter speed: {actual} kHz (cached for probe {serial})")
+            return actual
+
+        out.error("Adapter speed calibration failed: no speed passed the test pattern")
+        return None
+
+    def _test_speed(self, speed_khz, address, size):
+        """Run the test pattern at one clock step
+
+        Returns:
+            bool: True if every trial read back the pattern unchanged
+        """
+        try:
+            actual = self.manager.set_adapter_speed(speed_khz) or speed_khz
+        except RuntimeError:
+            out.warning(f"  {speed_khz:>5} kHz: rejected by adapter")
+            return False
+        elapsed = 0.0
+
+        for _ in range(self.trials):
+            pattern = os.urandom(size)
+            start = time.time()
+            readback = self._transfer(pattern, address)
+            elapsed += time.time() - start
+            if readback != pattern:
+                out.warning(f"  {actual:>5} kHz: FAILED")
+                return False
+
+        rate = (2 * size * self.trials) / elapsed / 1024 if elapsed > 0 else 0
+        out.info(f"  {actual:>5} kHz: OK ({rate:.1f} KB/s)")
+        return True
+
+    def _transfer(self, pattern, address):
+        """Write the pattern to RAM and dump it back
+
+        Returns:
+            bytes: Data read back, or None if either transfer failed
+        """
+        fd, write_path = tempfile.mkstemp(suffix=".bin")
+        read_path = f"{write_path}.readback"
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(pattern)
+
+            # Raw commands: retries would hide exactly the errors we look for.
+            # Tcl expects forward slashes, also on Windows.
+            response = self.manager._send_command_raw(
+                f"load_image {write_path.replace(os.sep, '/')} 0x{address:08x} bin")
+            if self.manager._is_command_failed(response):
+                return None
+            response = self.manager._send_command_raw(
+                f"dump_image {read_path.replace(os.sep, '/')} 0x{address:08x} {len(pattern)}")
+            if self.manager._is_command_failed(response) or not os.path.exists(read_path):
+                return None
+
+            with open(read_path, 'rb') as f:
+                return f.read()
+        finally:
+            for path in (write_path, read_path):
+                if os.path.exists(path):
+                    os.remove(path)
@@ -1,35 +1,74 @@
-"""Color utilities for terminal output"""
+"""Color utilities for terminal output
 
-from colorama import Fore, Style, init
+colorama is imported and initialized on first use, so headless runs that
+disable colors never load it. Without colorama, text stays uncolored.
+"""
 
-# Initialize colorama (auto-reset on Windows)
-init(autoreset=True)
-
-# Color definitions
-class Colors:
-    """Terminal color constants"""
+# Color name -> (colorama module attribute, code names)
+_PALETTE = {
     # Basic colors
-    RESET = Style.RESET_ALL
-    BRIGHT = Style.BRIGHT
-    DIM = Style.DIM
+    'RESET': ('Style', 'RESET_ALL'),
+    'BRIGHT': ('Style', 'BRIGHT'),
+    'DIM': ('Style', 'DIM'),
 
     # Foreground colors
-    RED = Fore.RED
-    GREEN = Fore.GREEN
-    YELLOW = Fore.YELLOW
-    BLUE = Fore.BLUE
-    MAGENTA = Fore.MAGENTA
-    CYAN = Fore.CYAN
-    WHITE = Fore.WHITE
+    'RED': ('Fore', 'RED'),
+    'GREEN': ('Fore', 'GREEN'),
+    'YELLOW': ('Fore', 'YELLOW'),
+    'BLUE': ('Fore', 'BLUE'),
+    'MAGENTA': ('Fore', 'MAGENTA'),
+    'CYAN': ('Fore', 'CYAN'),
+    'WHITE': ('Fore', 'WHITE'),
 
     # Semantic colors for different message types
-    SUCCESS = Fore.GREEN
-    ERROR = Fore.RED
-    WARNING = Fore.YELLOW
-    INFO = Fore.CYAN
-    HEADER = Fore.CYAN + Style.BRIGHT
-    MENU = Fore.BLUE + Style.BRIGHT
-    PROMPT = Fore.YELLOW
+    'SUCCESS': ('Fore', 'GREEN'),
+    'ERROR': ('Fore', 'RED'),
+    'WARNING': ('Fore', 'YELLOW'),
+    'INFO': ('Fore', 'CYAN'),
+    'HEADER': ('Fore', 'CYAN', 'Style', 'BRIGHT'),
+    'MENU': ('Fore', 'BLUE', 'Style', 'BRIGHT'),
+    'PROMPT': ('Fore', 'YELLOW'),
+}
+
+# Resolved color codes, None until first use
+_codes = None
+
+
+def _load_codes():
+    """Import colorama and resolve the palette"""
+    global _codes
+    try:
+        import colorama
+    except ImportError:
+        _codes = {}
+        return
+
+    # Initialize colorama (auto-reset on Windows)
+    colorama.init(autoreset=True)
+    _codes = {}
+    for name, spec in _PALETTE.items():
+        _codes[name] = "".join(getattr(getattr(colorama, spec[i]), spec[i + 1])
+                               for i in range(0, len(spec), 2))
+
+
+def disable_colors():
+    """Turn colors off for the rest of the run without loading colorama"""
+    global _codes
+    _codes = {}
+
+
+class _Colors:
+    """Terminal color constants, resolved on first access"""
+
+    def __getattr__(self, name):
+        if name not in _PALETTE:
+            raise AttributeError(name)
+        if _codes is None:
+            _load_codes()
+        return _codes.get(name, "")
+
+
+Colors = _Colors()
 
 
 def colored(text, color):
@@ -42,6 +81,8 @@ def colored(text, color):
     Returns:
         Colored text string
     """
+    if not color:
+        return text
     return f"{color}{text}{Colors.RESET}"
 
 
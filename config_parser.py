@@ -1,7 +1,8 @@
 """Config File Parser - Parses configuration files for automated operations"""
 
 import os
-from colors import error, info, warning
+from output import out
+from serialization import SerializationError, check_formats
 
 
 class ConfigParser:
@@ -10,6 +11,7 @@ class ConfigParser:
     def __init__(self, config_path):
         self.config_path = config_path
         self.target = None
+        self.elf = None
         self.commands = []
 
     def parse(self):
@@ -19,7 +21,7 @@ class ConfigParser:
             tuple: (target_cfg, commands_list) or (None, None) on error
         """
         if not os.path.exists(self.config_path):
-            print(error(f"Config file not found: {self.config_path}"))
+            out.error(f"Config file not found: {self.config_path}")
             return None, None
 
         try:
@@ -37,7 +39,14 @@ class ConfigParser:
                     target_value = line.split(':', 1)[1].strip()
                     self.target = self._parse_target(target_value)
                     if not self.target:
-                        print(error(f"Invalid target on line {line_num}: {target_value}"))
+                        out.error(f"Invalid target on line {line_num}: {target_value}")
+                        return None, None
+
+                # Parse ELF directive (symbol names for memory commands)
+                elif line.lower().startswith('elf:'):
+                    self.elf = line.split(':', 1)[1].strip()
+                    if not self.elf:
+                        out.error(f"Missing ELF file path on line {line_num}")
                         return None, None
 
                 # Parse command directives
@@ -47,24 +56,44 @@ class ConfigParser:
                     if cmd:
                         self.commands.append(cmd)
                     else:
-                        print(error(f"Invalid command on line {line_num}: {command_value}"))
+                        out.error(f"Invalid command on line {line_num}: {command_value}")
+                        return None, None
+
+                # Parse manifest directives (multi-image bundles)
+                elif line.lower().startswith('manifest:'):
+                    manifest_value = line.split(':', 1)[1].strip()
+                    cmd = self._parse_manifest(manifest_value, line_num)
+                    if cmd:
+                        self.commands.append(cmd)
+                    else:
+                        out.error(f"Invalid manifest on line {line_num}: {manifest_value}")
+                        return None, None
+
+                # Parse serialize directives (per-unit data patched into an image)
+                elif line.lower().startswith('serialize:'):
+                    serialize_value = line.split(':', 1)[1].strip()
+                    cmd = self._parse_serialize(serialize_value, line_num)
+                    if cmd:
+                        self.commands.append(cmd)
+                    else:
+                        out.error(f"Invalid serialize directive on line {line_num}: {serialize_value}")
                         return None, None
 
                 else:
-                    print(warning(f"Unknown directive on line {line_num}: {line}"))
+                    out.warning(f"Unknown directive on line {line_num}: {line}")
 
             # Validate that we have at least a target
             if not self.target:
-                print(error("No target specified in config file"))
+                out.error("No target specified in config file")
                 return None, None
 
             if not self.commands:
-                print(warning("No commands specified in config file"))
+                out.warning("No commands specified in config file")
 
             return self.target, self.commands
 
         except Exception as e:
-            print(error(f"Error reading config file: {e}"))
+            out.error(f"Error reading config file: {e}")
             return None, None
 
     def _parse_target(self, target_value):
@@ -122,6 +151,8 @@ class ConfigParser:
             'verify': {'requires_param': True, 'max_params': 2},  # filepath [address]
             'read_memory': {'requires_param': True, 'max_params': 2},  # address [count]
             'write_memory': {'requires_param': True, 'max_params': 2},  # address value
+            'rtt_start': {'requires_param': False, 'max_params': 3},  # [logfile] [port] [channel]
+            'rtt_stop': {'requires_param': False, 'max_params': 0},
             'custom': {'requires_param': True, 'max_params': -1},  # unlimited params
         }
 
@@ -133,7 +164,7 @@ class ConfigParser:
 
         # Check if parameter is required
         if valid_commands[cmd_type]['requires_param'] and not cmd_params:
-            print(error(f"Command '{cmd_type}' requires a parameter (line {line_num})"))
+            out.error(f"Command '{cmd_type}' requires a parameter (line {line_num})")
             return None
 
         # Parse command-specific parameters
@@ -154,6 +185,12 @@ class ConfigParser:
             result['address'] = cmd_params[0] if len(cmd_params) > 0 else None
             result['value'] = cmd_params[1] if len(cmd_params) > 1 else None
 
+        elif cmd_type == 'rtt_start':
+            # rtt_start: [logfile] [port] [channel]
+            result['filepath'] = cmd_params[0] if len(cmd_params) > 0 else None
+            result['port'] = cmd_params[1] if len(cmd_params) > 1 else None
+            result['channel'] = cmd_params[2] if len(cmd_params) > 2 else None
+
         elif cmd_type == 'custom':
             # custom: entire rest of line
             result['param'] = ' '.join(cmd_params)
@@ -163,3 +200,63 @@ class ConfigParser:
             result['param'] = None
 
         return result
+
+    def _parse_manifest(self, manifest_value, line_num):
+        """Parse a manifest directive and return command dictionary
+
+        Format: comma separated '<filepath> <address>' entries, optionally
+        followed by a 'force' entry to program even if already present.
+
+        Returns:
+            dict: Command dictionary with 'images' as (filepath, address) tuples
+        """
+        result = {'type': 'manifest', 'images': [], 'force': False}
+
+        for entry in manifest_value.split(','):
+            parts = entry.split()
+            if parts == ['force']:
+                result['force'] = True
+                continue
+            if len(parts) != 2:
+                out.error(f"Manifest entries must be '<filepath> <address>' (line {line_num})")
+                return None
+            try:
+                address = int(parts[1], 16)
+            except ValueError:
+                out.error(f"Invalid manifest address '{parts[1]}' (line {line_num})")
+                return None
+            result['images'].append((parts[0], address))
+
+        if not result['images']:
+            return None
+        return result
+
+    def _parse_serialize(self, serialize_value, line_num):
+        """Parse a serialize directive and return command dictionary
+
+        Format: space separated key=value pairs. Required keys are image,
+        source, patch and format; address defaults to the flash base.
+
+        Returns:
+            dict: Command dictionary with the key=value pairs
+        """
+        result = {'type': 'serialize'}
+
+        for token in serialize_value.split():
+            key, sep, value = token.partition('=')
+            if not sep or key not in ('image', 'address', 'source', 'patch', 'format'):
+                out.error(f"Unknown serialize parameter '{token}' (line {line_num})")
+                return None
+            result[key] = value
+
+        for key in ('image', 'source', 'patch', 'format'):
+            if key not in result:
+                out.error(f"Serialize directive requires '{key}=' (line {line_num})")
+                return None
+
+        try:
+            check_formats(result['format'].split(','))
+        except SerializationError as e:
+            out.error(f"{e} (line {line_num})")
+            return None
+        return result
@@ -0,0 +1,255 @@
+"""Device Database - Memory layout of the supported STM32 families
+
+Values describe the largest flash layout and the smallest RAM found in each
+family so that operations based on them stay safe on every part number.
+"""
+
+KB = 1024
+
+# idcode_address is the DBGMCU_IDCODE register, readable without halting.
+# write_align is the flash programming unit in bytes.
+# uid_address is the 96-bit unique device ID.
+# info_regions are the other non-volatile areas (system memory, OTP, option
+# bytes, data EEPROM) as (start, end) pairs, end exclusive.
+# Sector layouts are lists of (sector_size, count) pairs starting at the flash
+# base. A count of None repeats that sector size up to the end of flash.
+DEVICES = {
+    'target/stm32f0x.cfg': {
+        'name': 'STM32F0',
+        'flash_base': 0x08000000,
+        'flash_size': 256 * KB,
+        'sectors': [(2 * KB, None)],
+        'write_align': 2,
+        'info_regions': [(0x1FFFC800, 0x1FFFF810)],
+        'ram_start': 0x20000000,
+        'ram_size': 4 * KB,
+        'idcode_address': 0x40015800,
+        'uid_address': 0x1FFFF7AC,
+    },
+    'target/stm32f1x.cfg': {
+        'name': 'STM32F1',
+        'flash_base': 0x08000000,
+        'flash_size': 1024 * KB,
+        'sectors': [(2 * KB, None)],
+        'write_align': 2,
+        'info_regions': [(0x1FFFB000, 0x1FFFF810)],
+        'ram_start': 0x20000000,
+        'ram_size': 4 * KB,
+        'idcode_address': 0xE0042000,
+        'uid_address': 0x1FFFF7E8,
+    },
+    'target/stm32f2x.cfg': {
+        'name': 'STM32F2',
+        'flash_base': 0x08000000,
+        'flash_size': 1024 * KB,
+        'sectors': [(16 * KB, 4), (64 * KB, 1), (128 * KB, None)],
+        'write_align': 4,
+        'info_regions': [(0x1FFF0000, 0x1FFFC010)],
+        'ram_start': 0x20000000,
+        'ram_size': 64 * KB,
+        'idcode_address': 0xE0042000,
+        'uid_address': 0x1FFF7A10,
+    },
+    'target/stm32f3x.cfg': {
+        'name': 'STM32F3',
+        'flash_base': 0x08000000,
+        'flash_size': 512 * KB,
+        'sectors': [(2 * KB, None)],
+        'write_align': 2,
+        'info_regions': [(0x1FFFD800, 0x1FFFF810)],
+        'ram_start': 0x20000000,
+        'ram_size': 12 * KB,
+        'idcode_address': 0xE0042000,
+        'uid_address': 0x1FFFF7AC,
+    },
+    'target/stm32f4x.cfg': {
+        'name': 'STM32F4',
+        'flash_base': 0x08000000,
+        'flash_size': 2048 * KB,
+        'sectors': [(16 * KB, 4), (64 * KB, 1), (128 * KB, None)],
+        'write_align': 4,
+        'info_regions': [(0x1FFEC000, 0x1FFFC010)],
+        'ram_start': 0x20000000,
+        'ram_size': 32 * KB,
+        'idcode_address': 0xE0042000,
+        'uid_address': 0x1FFF7A10,
+    },
+    'target/stm32f7x.cfg': {
+        'name': 'STM32F7',
+        'flash_base': 0x08000000,
+        'flash_size': 2048 * KB,
+        'sectors': [(32 * KB, 4), (128 * KB, 1), (256 * KB, None)],
+        'write_align': 4,
+        'info_regions': [(0x1FF00000, 0x1FFF0020)],
+        'ram_start': 0x20000000,
+        'ram_size': 64 * KB,
+        'idcode_address': 0xE0042000,
+        'uid_address': 0x1FF0F420,
+    },
+    'target/stm32g0x.cfg': {
+        'name': 'STM32G0',
+        'flash_base': 0x08000000,
+        'flash_size': 512 * KB,
+        'sectors': [(2 * KB, None)],
+        'write_align': 8,
+        'info_regions': [(0x1FFF0000, 0x1FFF7880)],
+        'ram_start': 0x20000000,
+        'ram_size': 8 * KB,
+        'idcode_address': 0x40015800,
+        'uid_address': 0x1FFF7590,
+    },
+    'target/stm32g4x.cfg': {
+        'name': 'STM32G4',
+        'flash_base': 0x08000000,
+        'flash_size': 512 * KB,
+        'sectors': [(4 * KB, None)],
+        'write_align': 8,
+        'info_regions': [(0x1FFF0000, 0x1FFFF830)],
+        'ram_start': 0x20000000,
+        'ram_size': 16 * KB,
+        'idcode_address': 0xE0042000,
+        'uid_address': 0x1FFF7590,
+    },
+    'target/stm32h7x.cfg': {
+        'name': 'STM32H7',
+        'flash_base': 0x08000000,
+        'flash_size': 2048 * KB,
+        'sectors': [(128 * KB, None)],
+        'write_align': 32,
+        'info_regions': [(0x1FF00000, 0x1FF20000)],
+        'ram_start': 0x20000000,
+        'ram_size': 128 * KB,
+        'idcode_address': 0x5C001000,
+        'uid_address': 0x1FF1E800,
+    },
+    'target/stm32l0.cfg': {
+        'name': 'STM32L0',
+        'flash_base': 0x08000000,
+        'flash_size': 192 * KB,
+        'sectors': [(128, None)],
+        'write_align': 4,
+        'info_regions': [(0x08080000, 0x08081800), (0x1FF00000, 0x1FF80100)],
+        'ram_start': 0x20000000,
+        'ram_size': 2 * KB,
+        'idcode_address': 0x40015800,
+        'uid_address': 0x1FF80050,
+    },
+    'target/stm32l1.cfg': {
+        'name': 'STM32L1',
+        'flash_base': 0x08000000,
+        'flash_size': 512 * KB,
+        'sectors': [(256, None)],
+        'write_align': 4,
+        'info_regions': [(0x08080000, 0x08084000), (0x1FF00000, 0x1FF80100)],
+        'ram_start': 0x20000000,
+        'ram_size': 4 * KB,
+        'idcode_address': 0xE0042000,
+        'uid_address': 0x1FF80050,
+    },
+    'target/stm32l4x.cfg': {
+        'name': 'STM32L4',
+        'flash_base': 0x08000000,
+        'flash_size': 2048 * KB,
+        'sectors': [(8 * KB, None)],
+        'write_align': 8,
+        'info_regions': [(0x1FFF0000, 0x1FFFF810)],
+        'ram_start': 0x20000000,
+        'ram_size': 32 * KB,
+        'idcode_address': 0xE0042000,
+        'uid_address': 0x1FFF7590,
+    },
+    'target/stm32l5x.cfg': {
+        'name': 'STM32L5',
+        'flash_base': 0x08000000,
+        'flash_size': 512 * KB,
+        'sectors': [(4 * KB, None)],
+        'write_align': 8,
+        'info_regions': [(0x0BF90000, 0x0BFA0600)],
+        'ram_start': 0x20000000,
+        'ram_size': 192 * KB,
+        'idcode_address': 0xE0044000,
+        'uid_address': 0x0BFA0590,
+    },
+    'target/stm32wbx.cfg': {
+        'name': 'STM32WB',
+        'flash_base': 0x08000000,
+        'flash_size': 1024 * KB,
+        'sectors': [(4 * KB, None)],
+        'write_align': 8,
+        'info_regions': [(0x1FFF0000, 0x1FFF8080)],
+        'ram_start': 0x20000000,
+        'ram_size': 12 * KB,
+        'idcode_address': 0xE0042000,
+        'uid_address': 0x1FFF7590,
+    },
+    'target/stm32wlx.cfg': {
+        'name': 'STM32WL',
+        'flash_base': 0x08000000,
+        'flash_size': 256 * KB,
+        'sectors': [(2 * KB, None)],
+        'write_align': 8,
+        'info_regions': [(0x1FFF0000, 0x1FFF7880)],
+        'ram_start': 0x20000000,
+        'ram_size': 20 * KB,
+        'idcode_address': 0xE0042000,
+        'uid_address': 0x1FFF7590,
+    },
+}
+
+
+def get_device(target_cfg):
+    """Return the device description for a target config
+
+    Args:
+        target_cfg: OpenOCD target config path (e.g. 'target/stm32f4x.cfg')
+
+    Returns:
+        dict: Device description, or None for unknown targets
+    """
+    if not target_cfg:
+        return None
+    return DEVICES.get(target_cfg.replace('\\', '/'))
+
+
+def erase_granule(device):
+    """Return the largest erase sector size of a device
+
+    Addresses that are multiples of this size from the flash base always fall
+    on a sector boundary, for uniform and mixed sector layouts alike.
+    """
+    return max(size for size, _ in device['sectors'])
+
+
+def sector_bounds(device, address):
+    """Return the erase sector that contains an address
+
+    Args:
+        device: Device description from get_device()
+        address: Flash address
+
+    Returns:
+        tuple: (start, end) of the sector, end exclusive, or None if the
+            address is outside the flash
+    """
+    flash_end = device['flash_base'] + device['flash_size']
+    if not device['flash_base'] <= address < flash_end:
+        return None
+
+    start = device['flash_base']
+    for size, count in device['sectors']:
+        span = size * count if count is not None else flash_end - start
+        if address < start + span:
+            index = (address - start) // size
+            return start + index * size, start + (index + 1) * size
+        start += span
+    return None
+
+
+def nonvolatile_regions(device):
+    """Return all non-volatile memory regions of a device
+
+    Returns:
+        list: (start, end) pairs, end exclusive, main flash first
+    """
+    flash = (device['flash_base'], device['flash_base'] + device['flash_size'])
+    return [flash] + device['info_regions']
@@ -0,0 +1,494 @@
+"""Emulator - In-process simulated target for dry-running configs without hardware
+
+EmulatedTarget answers the OpenOCD commands this tool sends, backed by a
+sparse memory model with the flash sector layout of the device database:
+flash reads as 0xFF after an erase, programming can only clear bits, and
+flash commands need a halted core. EmulatedTransport plugs the target into
+OpenOCDManager in place of the telnet session and records every operation
+with its estimated duration on real hardware.
+"""
+
+import hashlib
+import shlex
+import socket
+import struct
+import threading
+import time
+from collections import Counter
+from devices import get_device, sector_bounds
+from images import ImageError, load_image
+
+KB = 1024
+PAGE_SIZE = 4 * KB
+
+# Layout used for targets missing from the device database
+GENERIC_DEVICE = {
+    'name': 'Generic',
+    'flash_base': 0x08000000,
+    'flash_size': 1024 * KB,
+    'sectors': [(2 * KB, None)],
+    'write_align': 4,
+    'info_regions': [],
+    'ram_start': 0x20000000,
+    'ram_size': 64 * KB,
+    'idcode_address': 0xE0042000,
+    'uid_address': None,
+}
+
+# Hardware timing model for the estimated run time
+COMMAND_OVERHEAD = 0.002                # Probe USB round trip per command (s)
+SWD_CLOCKS_PER_BYTE = 12                # Including SWD protocol overhead
+USB_BYTES_PER_SECOND = 1024 * KB        # Probe throughput ceiling
+PROGRAM_BYTES_PER_SECOND = 64 * KB      # Flash loader programming rate
+ERASE_SECONDS_PER_KB = 0.008            # ~1 s per 128 KB sector
+CHECKSUM_BYTES_PER_SECOND = 8 * 1024 * KB
+RESET_SECONDS = 0.1
+
+DPIDR = 0x2BA01477
+DBGMCU_IDCODE = 0x10016413
+
+# Commands that only reach the probe and answer without a target
+PROBE_VERBS = ('adapter', 'dap')
+
+class EmulatorError(Exception):
+    """Raised by a command handler; the message becomes the OpenOCD error"""
+
+
+class SparseMemory:
+    """Byte-addressable memory stored in pages that are created on first write"""
+
+    def __init__(self, erased_regions):
+        self.erased_regions = erased_regions
+        self.pages = {}
+
+    def _fill(self, page_address):
+        """Content of an untouched page: 0xFF in non-volatile memory, zero elsewhere"""
+        erased = any(start <= page_address < end for start, end in self.erased_regions)
+        return 0xFF if erased else 0x00
+
+    def read(self, address, length):
+        data = bytearray()
+        while length > 0:
+            page_address = address - address % PAGE_SIZE
+            offset = address - page_address
+            size = min(length, PAGE_SIZE - offset)
+            page = self.pages.get(page_address)
+            if page is None:
+                data += bytes([self._fill(page_address)]) * size
+            else:
+                data += page[offset:offset + size]
+            address += size
+            length -= size
+        return bytes(data)
+
+    def write(self, address, data, program=False):
+        """Store data; with program=True bits can only be cleared, like flash"""
+        view = memoryview(data)
+        while view:
+            page_address = address - address % PAGE_SIZE
+            offset = address - page_address
+            size = min(len(view), PAGE_SIZE - offset)
+            page = self.pages.get(page_address)
+            if page is None:
+                page = self.pages[page_address] = bytearray([self._fill(page_address)]) * PAGE_SIZE
+            if program:
+                current = int.from_bytes(page[offset:offset + size], 'little')
+                new = int.from_bytes(view[:size], 'little')
+                page[offset:offset + size] = (current & new).to_bytes(size, 'little')
+            else:
+                page[offset:offset + size] = view[:size]
+            address += size
+            view = view[size:]
+
+    def erase(self, start, end):
+        """Return [start, end) to the erased state"""
+        for page_address in [p for p in self.pages if start <= p and p + PAGE_SIZE <= end]:
+            del self.pages[page_address]
+        for page_address in [p for p in self.pages if p < end and p + PAGE_SIZE > start]:
+            lo, hi = max(start, page_address), min(end, page_address + PAGE_SIZE)
+            self.pages[page_address][lo - page_address:hi - page_address] = b"\xff" * (hi - lo)
+
+
+class EmulatedTarget:
+    """Simulated STM32 answering OpenOCD telnet commands"""
+
+    def __init__(self, target_cfg=None, serial=None, board_swap=None):
+        """
+        Args:
+            target_cfg: OpenOCD target config selecting the device layout
+            serial: Probe serial number reported by 'adapter serial'
+            board_swap: Simulate an operator changing boards: once a board has
+                been used and then only polled for this many seconds, it is
+                removed, and a new board is inserted the same time later.
+                None keeps one board.
+        """
+        self.device = get_device(target_cfg) or GENERIC_DEVICE
+        self.flash_start = self.device['flash_base']
+        self.flash_end = self.flash_start + self.device['flash_size']
+        self.serial = serial or "EMU0001"
+        self.board_swap = board_swap
+        self.board = 0
+        self.present = True
+        self.used = False
+        self.speed = 2000
+        self._changed = time.time()
+        self._rtt_servers = {}
+        self._insert_board()
+
+    def _insert_board(self):
+        """Fit a blank board with its own unique device ID"""
+        self.memory = SparseMemory([(self.flash_start, self.flash_end)] + self.device['info_regions'])
+        self.halted = False
+        self.used = False
+        self.memory.write(self.device['idcode_address'], DBGMCU_IDCODE.to_bytes(4, 'little'))
+        if self.device['uid_address']:
+            # Stable per serial and board, so UID-based serialization is reproducible
+            seed = self.serial if self.board == 0 else f"{self.serial}#{self.board}"
+            self.memory.write(self.device['uid_address'], hashlib.sha256(seed.encode()).digest()[:12])
+
+    def _update_presence(self, verb):
+        """Advance the simulated operator; only polls let a board be swapped"""
+        now = time.time()
+        if verb not in PROBE_VERBS and not verb.endswith('.dap'):
+            if self.present:
+                self.used = True
+                self._changed = now
+            return
+        if now - self._changed < self.board_swap or (self.present and not self.used):
+            return
+        if not self.present:
+            self.board += 1
+            self._insert_board()
+        self.present = not self.present
+        self._changed = now
+
+    def _map(self, address):
+        """Resolve the boot alias: flash is also visible from address 0"""
+        if self.flash_start and address < self.device['flash_size']:
+            return address + self.flash_start
+        return address
+
+    def _is_flash(self, start, end):
+        return self.flash_start <= start and end <= self.flash_end
+
+    def _memory_rate(self):
+        return min(self.speed * 1000 / SWD_CLOCKS_PER_BYTE, USB_BYTES_PER_SECOND)
+
+    def execute(self, command):
+        """Run one command
+
+        Returns:
+            tuple: (response text, bytes transferred, estimated seconds on hardware)
+        """
+        try:
+            args = shlex.split(command)
+        except ValueError:
+            args = command.split()
+        if not args:
+            return "", 0, 0.0
+
+        if self.board_swap:
+            self._update_presence(args[0])
+        if not self.present and args[0] not in PROBE_VERBS:
+            return "Error: no target connected to the probe", 0, COMMAND_OVERHEAD
+
+        handler = getattr(self, f"_cmd_{args[0].replace('.', '_')}", None)
+        if handler is None:
+            return f'invalid command name "{args[0]}"', 0, COMMAND_OVERHEAD
+        try:
+            response, length, seconds = handler(args[1:])
+        except (EmulatorError, ImageError, OSError) as e:
+            response, length, seconds = f"Error: {e}", 0, 0.0
+        except (IndexError, ValueError):
+            response, length, seconds = f"Error: invalid arguments for '{args[0]}'", 0, 0.0
+        return response, length, seconds + COMMAND_OVERHEAD
+
+    # Core state
+
+    def _cmd_halt(self, args):
+        self.halted = True
+        return "target halted due to debug-request, current mode: Thread", 0, 0.0
+
+    def _cmd_resume(self, args):
+        self.halted = False
+        return "", 0, 0.0
+
+    def _cmd_reset(self, args):
+        self.halted = bool(args) and args[0] in ("halt", "init")
+        response = "target halted due to debug-request, current mode: Thread" if self.halted else ""
+        return response, 0, RESET_SECONDS
+
+    def _cmd_targets(self, args):
+        state = "halted" if self.halted else "running"
+        return f" 0* {self.device['name'].lower()}.cpu cortex_m little {state}", 0, 0.0
+
+    # Debug port and adapter
+
+    def _cmd_dap(self, args):
+        if args == ["names"]:
+            return "stm32.dap", 0, 0.0
+        raise EmulatorError(f"dap {' '.join(args)} not supported")
+
+    def _cmd_stm32_dap(self, args):
+        if args == ["dpreg", "0"]:
+            return f"0x{DPIDR:08x}", 0, 0.0
+        raise EmulatorError(f"stm32.dap {' '.join(args)} not supported")
+
+    def _cmd_adapter(self, args):
+        if args[0] == "speed":
+            if len(args) > 1:
+                self.speed = int(args[1])
+            return f"adapter speed: {self.speed} kHz", 0, 0.0
+        if args[0] == "serial":
+            return self.serial, 0, 0.0
+        raise EmulatorError(f"adapter {args[0]} not supported")
+
+    # Memory
+
+    def _cmd_mdw(self, args):
+        address, count = self._map(int(args[0], 0)), int(args[1], 0) if len(args) > 1 else 1
+        data = self.memory.read(address, count * 4)
+        lines = []
+        for row in range(0, count, 8):
+            words = struct.unpack_from(f"<{min(8, count - row)}I", data, row * 4)
+            lines.append(f"0x{address + row * 4:08x}: " + " ".join(f"{word:08x}" for word in words))
+        return "\n".join(lines), len(data), len(data) / self._memory_rate()
+
+    def _cmd_mww(self, args):
+        address, value = self._map(int(args[0], 0)), int(args[1], 0)
+        count = int(args[2], 0) if len(args) > 2 else 1
+        if self._is_flash(address, address + 1):
+            raise EmulatorError(f"Failed to write memory at 0x{address:08x}")
+        self.memory.write(address, value.to_bytes(4, 'little') * count)
+        return "", 4 * count, 4 * count / self._memory_rate()
+
+    def _cmd_load_image(self, args):
+        offset = int(args[1], 0) if len(args) > 1 else None
+        segments = load_image(args[0], offset, args[2] if len(args) > 2 else None)
+        length = 0
+        for address, data in segments:
+            address = self._map(address)
+            if self._is_flash(address, address + 1):
+                raise EmulatorError(f"Failed to write memory at 0x{address:08x}")
+            self.memory.write(address, data)
+            length += len(data)
+        return (f"{length} bytes written at address 0x{self._map(segments[0][0]):08x}",
+                length, length / self._memory_rate())
+
+    def _cmd_dump_image(self, args):
+        address, length = self._map(int(args[1], 0)), int(args[2], 0)
+        with open(args[0], 'wb') as f:
+            f.write(self.memory.read(address, length))
+        return f"dumped {length} bytes", length, length / self._memory_rate()
+
+    # Flash
+
+    def _program(self, segments, erase):
+        """Erase (optionally) and program segments into flash
+
+        Returns:
+            tuple: (programmed bytes, estimated seconds)
+        """
+        if not self.halted:
+            raise EmulatorError("Target not halted")
+        seconds = 0.0
+        length = 0
+        for address, data in segments:
+            address = self._map(address)
+            if not self._is_flash(address, address + len(data)):
+                raise EmulatorError(f"no flash bank found for address 0x{address:08x}")
+            if erase:
+                seconds += self._erase_range(address, address + len(data))
+            self.memory.write(address, data, program=True)
+            length += len(data)
+        seconds += length / self._memory_rate() + length / PROGRAM_BYTES_PER_SECOND
+        return length, seconds
+
+    def _erase_range(self, start, end):
+        """Erase every sector touched by [start, end) and return the erase time"""
+        seconds = 0.0
+        address = start
+        while address < end:
+            sector_start, sector_end = sector_bounds(self.device, address)
+            self.memory.erase(sector_start, sector_end)
+            seconds += (sector_end - sector_start) / KB * ERASE_SECONDS_PER_KB
+            address = sector_end
+        return seconds
+
+    def _cmd_flash(self, args):
+        if args[0] == "write_image":
+            args = args[1:]
+            erase = bool(args) and args[0] == "erase"
+            if erase:
+                args = args[1:]
+            offset = int(args[1], 0) if len(args) > 1 else None
+            segments = load_image(args[0], offset, args[2] if len(args) > 2 else None)
+            length, seconds = self._program(segments, erase)
+            return f"wrote {length} bytes from file {args[0]} in {seconds:.3f}s", length, seconds
+
+        if args[0] == "erase_sector":
+            if not self.halted:
+                raise EmulatorError("Target not halted")
+            seconds = self._erase_range(self.flash_start, self.flash_end)
+            return f"erased sectors on flash bank {args[1]} in {seconds:.3f}s", 0, seconds
+
+        raise EmulatorError(f"flash {args[0]} not supported")
+
+    def _cmd_program(self, args):
+        options = [arg for arg in args[1:] if arg in ("verify", "reset", "exit")]
+        values = [arg for arg in args[1:] if arg not in options]
+        offset = int(values[0], 0) if values else None
+        try:
+            segments = load_image(args[0], offset, None)
+            # Like OpenOCD's program script: reset init first, which halts the core
+            self.halted = True
+            length, seconds = self._program(segments, erase=True)
+        except (EmulatorError, ImageError, OSError) as e:
+            return f"** Programming Failed **\n{e}", 0, 0.0
+        response = "** Programming Started **\n** Programming Finished **"
+        if "verify" in options:
+            seconds += length / CHECKSUM_BYTES_PER_SECOND
+            response += "\n** Verified OK **"
+        if "reset" in options:
+            self.halted = False
+            seconds += RESET_SECONDS
+        return response, length, seconds
+
+    def _verify(self, args):
+        """Compare an image with the memory
+
+        Returns:
+            tuple: (total bytes, address of the first difference or None)
+        """
+        offset = int(args[1], 0) if len(args) > 1 else None
+        segments = load_image(args[0], offset, args[2] if len(args) > 2 else None)
+        length = 0
+        for address, data in segments:
+            address = self._map(address)
+            current = self.memory.read(address, len(data))
+            if current != data:
+                index = next(i for i in range(len(data)) if current[i] != data[i])
+                return length + len(data), address + index
+            length += len(data)
+        return length, None
+
+    def _cmd_verify_image(self, args):
+        length, difference = self._verify(args)
+        seconds = length / CHECKSUM_BYTES_PER_SECOND
+        if difference is not None:
+            # OpenOCD falls back to reading the image back on a checksum mismatch
+            return (f"checksum mismatch - attempting binary compare\n"
+                    f"diff 0 address 0x{difference:08x}\nverify failed",
+                    length, seconds + length / self._memory_rate())
+        return f"verified {length} bytes in {seconds:.3f}s", length, seconds
+
+    def _cmd_verify_image_checksum(self, args):
+        length, difference = self._verify(args)
+        seconds = length / CHECKSUM_BYTES_PER_SECOND
+        if difference is not None:
+            return "checksum mismatch\nverify failed", length, seconds
+        return f"verified {length} bytes in {seconds:.3f}s", length, seconds
+
+    # RTT
+
+    def _cmd_rtt(self, args):
+        if args[0] == "start":
+            return f"rtt: Control block found at 0x{self.device['ram_start']:08x}", 0, 0.0
+        if args[:2] == ["server", "start"]:
+            self._start_rtt_server(int(args[2]))
+            return f"Listening on port {args[2]} for rtt connections", 0, 0.0
+        if args[:2] == ["server", "stop"]:
+            server = self._rtt_servers.pop(int(args[2]), None)
+            if server:
+                server.close()
+        return "", 0, 0.0
+
+    def _start_rtt_server(self, port):
+        """Accept RTT connections on a port; the emulated firmware logs nothing"""
+        if port in self._rtt_servers:
+            return
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(("127.0.0.1", port))
+        server.listen(1)
+        self._rtt_servers[port] = server
+
+        def accept_loop():
+            connections = []
+            while True:
+                try:
+                    connection, _ = server.accept()
+                except OSError:
+                    break
+                connections.append(connection)
+            for connection in connections:
+                connection.close()
+
+        threading.Thread(target=accept_loop, name=f"rtt-emulator-{port}", daemon=True).start()
+
+    def close(self):
+        for server in self._rtt_servers.values():
+            server.close()
+        self._rtt_servers.clear()
+
+
+class EmulatedTransport:
+    """OpenOCDManager transport backed by an EmulatedTarget"""
+
+    # No OpenOCD process is involved
+    requires_openocd = False
+
+    def __init__(self, target, realistic_latency=False):
+        """
+        Args:
+            target: EmulatedTarget instance
+            realistic_latency: Sleep for the estimated hardware time of every
+                command instead of answering immediately
+        """
+        self.target = target
+        self.realistic_latency = realistic_latency
+        self.connected = False
+        self.operations = []
+        self.start_time = time.time()
+
+    def connect(self):
+        self.connected = True
+
+    def send(self, command, timeout=5):
+        """Execute a command on the emulated target
+
+        Returns:
+            str: Response text, or None if the transport is closed
+        """
+        if not self.connected:
+            return None
+        response, length, seconds = self.target.execute(command)
+        self.operations.append((command, length, seconds))
+        if self.realistic_latency:
+            time.sleep(seconds)
+        return response
+
+    def close(self):
+        self.connected = False
+        self.target.close()
+
+    def report(self):
+        """Summarize the recorded operations
+
+        Returns:
+            dict: 'commands', per-verb 'counts' and 'bytes', the
+                'estimated_seconds' on hardware and the 'elapsed_seconds'
+        """
+        counts, transferred = Counter(), Counter()
+        for command, length, _ in self.operations:
+            verb = " ".join(command.split()[:2]) if command.startswith(("flash ", "rtt ", "reset")) \
+                else command.split()[0]
+            counts[verb] += 1
+            transferred[verb] += length
+        return {
+            'commands': len(self.operations),
+            'counts': dict(counts),
+            'bytes': dict(transferred),
+            'estimated_seconds': sum(seconds for _, _, seconds in self.operations),
+            'elapsed_seconds': time.time() - self.start_time,
+        }
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Fake OpenOCD - Telnet stand-in for testing without a probe or a target
+
+Accepts the command line OpenOCDManager passes to OpenOCD, serves the telnet
+prompt on the configured port and answers the commands with an emulated
+target (see emulator.py). Use it as the OpenOCD binary, e.g.
+`python3 farm.py agent --openocd-bin ./fake_openocd.py ...`.
+
+Set FAKE_OPENOCD_BOARD_SWAP to a number of seconds to simulate an operator
+replacing the board whenever the probe has only been polled for that long.
+"""
+
+import os
+import re
+import socket
+import sys
+from emulator import EmulatedTarget
+
+DEFAULT_PORT = 4444
+
+
+def parse_args(argv):
+    """Extract the telnet port, target config and probe serial from the command line"""
+    port, target_cfg, serial = DEFAULT_PORT, None, None
+    for flag, value in zip(argv, argv[1:]):
+        if flag == "-f" and value.startswith("target/"):
+            target_cfg = value
+        elif flag == "-c":
+            match = re.fullmatch(r"(telnet_port|adapter serial)\s+(\S+)", value.strip())
+            if match and match.group(1) == "telnet_port":
+                port = int(match.group(2))
+            elif match:
+                serial = match.group(2)
+    return port, target_cfg, serial
+
+
+def serve(port, target):
+    """Serve telnet sessions one after another until 'shutdown'"""
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(("127.0.0.1", port))
+    server.listen(1)
+    while True:
+        connection, _ = server.accept()
+        with connection:
+            connection.sendall(b"Open On-Chip Debugger\r\n> ")
+            buffer = b""
+            while True:
+                data = connection.recv(65536)
+                if not data:
+                    break
+                buffer += data
+                while b"\n" in buffer:
+                    line, buffer = buffer.split(b"\n", 1)
+                    command = line.decode('ascii', 'replace').strip()
+                    if command == "shutdown":
+                        connection.sendall(b"shutdown command invoked\r\n")
+                        target.close()
+                        return
+                    response, _, _ = target.execute(command)
+                    connection.sendall(response.replace("\n", "\r\n").encode('ascii') + b"\r\n> ")
+
+
+def main():
+    port, target_cfg, serial = parse_args(sys.argv[1:])
+    print(f"Fake OpenOCD listening for telnet connections on port {port}", file=sys.stderr)
+    board_swap = float(os.environ.get("FAKE_OPENOCD_BOARD_SWAP", "0")) or None
+    serve(port, EmulatedTarget(target_cfg, serial, board_swap))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
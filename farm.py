@@ -0,0 +1,565 @@
+#!/usr/bin/env python3
+"""Flashing Farm - Agents serving local probes and a controller dispatching jobs
+
+An agent wraps one OpenOCDManager per local probe behind a JSON-lines TCP
+API. The controller ships config jobs (config text plus the files it
+references) to agents with free probes, collects the results and retries
+failed boards on the probe they are still fitted to. Every job waits for a
+fresh board: the previous one is removed and a new one inserted.
+
+    python3 farm.py agent --probes SERIAL1,SERIAL2 --port 7300
+    python3 farm.py controller --agents hostA:7300,hostB:7300 --count 20 config.txt
+"""
+
+import argparse
+import base64
+import json
+import os
+import shutil
+import signal
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from adapter_speed import AdapterSpeedTuner
+from config_parser import ConfigParser
+from main import execute_config_commands
+from openocd_manager import OpenOCDManager
+from output import out
+from station import wait_for_presence
+from symbols import SymbolIndex
+
+DEFAULT_AGENT_PORT = 7300
+
+# Telnet port of the first probe; further probes use the following ports
+BASE_TELNET_PORT = 4444
+
+# Seconds an agent waits for a board change before handing the job back
+BOARD_TIMEOUT = 120
+
+
+def referenced_files(commands, elf=None):
+    """Return the local files a parsed config needs
+
+    Args:
+        commands: Command dictionaries from ConfigParser
+        elf: Path from the 'elf:' directive, or None
+
+    Returns:
+        list: File paths as written in the config
+    """
+    paths = [elf] if elf else []
+    for cmd in commands:
+        if cmd['type'] in ('flash', 'verify') and cmd.get('filepath'):
+            paths.append(cmd['filepath'])
+        elif cmd['type'] == 'manifest':
+            paths.extend(filepath for filepath, _ in cmd['images'])
+        elif cmd['type'] == 'serialize':
+            paths.append(cmd['image'])
+    return list(dict.fromkeys(paths))
+
+
+def localize_commands(commands, paths):
+    """Rewrite the file paths of commands to the copies received by an agent
+
+    Args:
+        commands: Command dictionaries from ConfigParser
+        paths: Dict mapping config paths to local paths
+
+    Returns:
+        list: New command dictionaries
+    """
+    localized = []
+    for cmd in commands:
+        cmd = dict(cmd)
+        if cmd['type'] in ('flash', 'verify') and cmd.get('filepath') in paths:
+            cmd['filepath'] = paths[cmd['filepath']]
+        elif cmd['type'] == 'manifest':
+            cmd['images'] = [(paths.get(filepath, filepath), address) for filepath, address in cmd['images']]
+        elif cmd['type'] == 'serialize':
+            cmd['image'] = paths.get(cmd['image'], cmd['image'])
+        localized.append(cmd)
+    return localized
+
+
+def build_job(config_path):
+    """Bundle a config file and the files it references into a job
+
+    Returns:
+        dict: Job request with 'config' text and base64 'files'
+
+    Raises:
+        ValueError: If the config is invalid
+        FileNotFoundError: If a referenced file does not exist
+    """
+    parser = ConfigParser(config_path)
+    target_cfg, commands = parser.parse()
+    if not target_cfg:
+        raise ValueError(f"Invalid config file: {config_path}")
+
+    files = {}
+    for path in referenced_files(commands, parser.elf):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"File '{path}' referenced by {config_path} not found")
+        with open(path, 'rb') as f:
+            files[path] = base64.b64encode(f.read()).decode('ascii')
+
+    with open(config_path, 'r') as f:
+        config = f.read()
+    return {'op': 'run', 'name': config_path, 'config': config, 'files': files}
+
+
+class ProbeSlot:
+    """One local probe of an agent and its warm OpenOCD session"""
+
+    def __init__(self, serial, telnet_port):
+        self.serial = serial
+        self.telnet_port = telnet_port
+        self.manager = None
+        self.busy = False
+        # A job ran on the fitted board; it must be replaced before the next job
+        self.board_used = False
+        self.chip_uid = None
+        # The fitted board failed and is kept for a retry
+        self.failed = False
+
+
+class FarmAgent:
+    """Run config jobs on the probes attached to this host"""
+
+    def __init__(self, probes, interface_cfg="interface/stlink.cfg", openocd_bin="openocd",
+                 base_port=BASE_TELNET_PORT, token=None, board_timeout=BOARD_TIMEOUT):
+        """
+        Args:
+            probes: Serial numbers of the local debug probes
+            interface_cfg: OpenOCD interface config
+            openocd_bin: OpenOCD executable (or a stand-in such as fake_openocd.py)
+            base_port: Telnet port of the first probe's OpenOCD
+            token: Shared secret required in every request, or None
+            board_timeout: Seconds to wait for a board removal or insert
+        """
+        self.slots = [ProbeSlot(serial, base_port + index) for index, serial in enumerate(probes)]
+        self.interface_cfg = interface_cfg
+        self.openocd_bin = openocd_bin
+        self.token = token
+        self.board_timeout = board_timeout
+        self.name = socket.gethostname()
+        self._lock = threading.Lock()
+
+    def handle(self, request):
+        """Answer one API request
+
+        Returns:
+            dict: Response with 'ok' and either results or 'error'
+        """
+        if self.token and request.get('token') != self.token:
+            return {'ok': False, 'error': "Invalid token"}
+        op = request.get('op')
+        if op == 'status':
+            with self._lock:
+                probes = [{'serial': slot.serial, 'busy': slot.busy} for slot in self.slots]
+            return {'ok': True, 'agent': self.name, 'probes': probes}
+        if op == 'run':
+            return self.run_job(request)
+        return {'ok': False, 'error': f"Unknown operation: {op}"}
+
+    def run_job(self, request):
+        """Run a job on a free probe (or the requested one) and wait for the result"""
+        with self._lock:
+            candidates = [slot for slot in self.slots if not slot.busy
+                          and request.get('probe') in (None, slot.serial)]
+            # Leave probes holding a failed board to its retry
+            slot = min(candidates, key=lambda slot: slot.failed, default=None)
+            if slot is None:
+                return {'ok': False, 'busy': True, 'error': "No free probe"}
+            slot.busy = True
+
+        try:
+            return self._run_on(slot, request)
+        except Exception as e:
+            return {'ok': False, 'agent': self.name, 'probe': slot.serial, 'error': str(e)}
+        finally:
+            with self._lock:
+                slot.busy = False
+
+    def _run_on(self, slot, request):
+        workdir = tempfile.mkdtemp(prefix="farm_job_")
+        try:
+            paths = {}
+            for index, (name, encoded) in enumerate(sorted(request.get('files', {}).items())):
+                paths[name] = os.path.join(workdir, f"{index}_{os.path.basename(name)}")
+                with open(paths[name], 'wb') as f:
+                    f.write(base64.b64decode(encoded))
+            config_path = os.path.join(workdir, "job.cfg")
+            with open(config_path, 'w') as f:
+                f.write(request['config'])
+
+            parser = ConfigParser(config_path)
+            target_cfg, commands = parser.parse()
+            if not target_cfg:
+                return {'ok': False, 'agent': self.name, 'probe': slot.serial, 'error': "Invalid config"}
+
+            manager = self._manager_for(slot, target_cfg)
+            if manager is None:
+                return {'ok': False, 'agent': self.name, 'probe': slot.serial,
+                        'error': "Failed to start OpenOCD"}
+            manager.symbols = SymbolIndex(paths.get(parser.elf, parser.elf)) if parser.elf else None
+
+            try:
+                chip_uid = self._await_board(slot, manager, request)
+            except TimeoutError as e:
+                return {'ok': False, 'no_board': True, 'agent': self.name, 'probe': slot.serial,
+                        'error': str(e)}
+            except LookupError as e:
+                return {'ok': False, 'board_gone': True, 'agent': self.name, 'probe': slot.serial,
+                        'error': str(e)}
+            # Flash contents are from the previous board
+            manager.invalidate_read_cache()
+
+            out.info(f"Job {request.get('name', '')} on probe {slot.serial} (board {chip_uid or 'unknown'})")
+            timings = []
+            start = time.time()
+            exit_code = execute_config_commands(manager, localize_commands(commands, paths), timings)
+            slot.failed = exit_code != 0
+            return {
+                'ok': True,
+                'agent': self.name,
+                'probe': slot.serial,
+                'chip_uid': chip_uid,
+                'exit_code': exit_code,
+                'seconds': round(time.time() - start, 3),
+                'steps': [{'type': cmd_type, 'seconds': round(seconds, 3), 'passed': passed}
+                          for cmd_type, seconds, passed in timings],
+            }
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def _await_board(self, slot, manager, request):
+        """Wait for a fresh board, or check that the board of a retry is still fitted
+
+        Returns:
+            str: Chip UID of the board, or None if the device has no UID
+
+        Raises:
+            TimeoutError: If the board was not replaced within the board timeout
+            LookupError: If the board of a retry has been replaced
+        """
+        if request.get('retry'):
+            # Without a UID a swapped board cannot be told apart; trust the slot
+            if not slot.failed or manager.read_chip_uid() != request.get('chip_uid'):
+                slot.failed = False
+                raise LookupError("Failed board is no longer on the probe")
+            return slot.chip_uid
+
+        if slot.board_used:
+            out.info(f"Remove the board from probe {slot.serial}...")
+            wait_for_presence(manager, False, timeout=self.board_timeout)
+            slot.board_used = slot.failed = False
+            slot.chip_uid = manager.chip_uid = None
+        out.info(f"Waiting for a board on probe {slot.serial}...")
+        wait_for_presence(manager, True, timeout=self.board_timeout)
+        slot.board_used = True
+        slot.chip_uid = manager.read_chip_uid()
+        return slot.chip_uid
+
+    def _manager_for(self, slot, target_cfg):
+        """Return a connected manager for the slot, keeping OpenOCD warm between jobs"""
+        manager = slot.manager
+        if manager and manager.target_cfg == target_cfg:
+            if manager.connected or manager.reconnect():
+                return manager
+        if manager:
+            manager.stop_openocd()
+            slot.manager = None
+
+        manager = OpenOCDManager(interface_cfg=self.interface_cfg, target_cfg=target_cfg,
+                                 port=slot.telnet_port, serial=slot.serial,
+                                 openocd_bin=self.openocd_bin)
+        if not manager.start_openocd() or not manager.connect_telnet():
+            manager.stop_openocd()
+            return None
+        AdapterSpeedTuner(manager).apply_cached()
+        slot.manager = manager
+        return manager
+
+    def close(self):
+        """Stop all OpenOCD instances"""
+        for slot in self.slots:
+            if slot.manager:
+                slot.manager.stop_openocd()
+                slot.manager = None
+
+
+class _AgentHandler(socketserver.StreamRequestHandler):
+    """One JSON request per line, one JSON response per line"""
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                reply = {'ok': False, 'error': "Invalid JSON"}
+            else:
+                reply = self.server.agent.handle(request)
+            self.wfile.write((json.dumps(reply) + "\n").encode('utf-8'))
+            self.wfile.flush()
+
+
+class AgentServer(socketserver.ThreadingTCPServer):
+    """TCP server exposing a FarmAgent"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, agent, host="127.0.0.1", port=DEFAULT_AGENT_PORT):
+        self.agent = agent
+        super().__init__((host, port), _AgentHandler)
+
+
+class FarmController:
+    """Schedule config jobs across agents by probe availability"""
+
+    def __init__(self, agents, token=None, max_attempts=2, timeout=600):
+        """
+        Args:
+            agents: Agent addresses as 'host:port' strings
+            token: Shared secret of the agents, or None
+            max_attempts: Attempts per board before it is reported as failed
+            timeout: Seconds to wait for a single job
+        """
+        self.agents = agents
+        self.token = token
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+
+    def _request(self, agent, request, timeout=10):
+        """Send one request to an agent and return its response"""
+        host, _, port = agent.rpartition(':')
+        if self.token:
+            request = dict(request, token=self.token)
+        with socket.create_connection((host, int(port)), timeout=timeout) as sock:
+            sock.sendall((json.dumps(request) + "\n").encode('utf-8'))
+            reply = sock.makefile('rb').readline()
+        if not reply:
+            raise ConnectionError(f"Agent {agent} closed the connection")
+        return json.loads(reply)
+
+    def free_probes(self):
+        """Query every agent for its free probes
+
+        Returns:
+            dict: Agent address -> number of free probes (unreachable agents are left out)
+        """
+        free = {}
+        for agent in self.agents:
+            try:
+                status = self._request(agent, {'op': 'status'})
+            except (OSError, ValueError) as e:
+                out.warning(f"Agent {agent} unavailable: {e}")
+                continue
+            if status.get('ok'):
+                free[agent] = sum(1 for probe in status['probes'] if not probe['busy'])
+            else:
+                out.warning(f"Agent {agent} refused status: {status.get('error')}")
+        return free
+
+    def run(self, jobs):
+        """Run jobs until each passed or used up its attempts
+
+        Each job programs one fresh board. A failed board is retried on the
+        probe it is fitted to, checked by its chip UID; it is never replaced
+        by a board on another agent.
+
+        Args:
+            jobs: Job requests from build_job()
+
+        Returns:
+            list: Per job dict with 'name', 'passed', the list of 'attempts'
+                and the 'board' (agent, probe and chip UID) once one was used
+        """
+        results = [{'name': job.get('name'), 'passed': False, 'attempts': []} for job in jobs]
+        pending = deque(range(len(jobs)))
+        free = self.free_probes()
+        condition = threading.Condition()
+        running = 0
+
+        def worker(index, agent):
+            nonlocal running
+            start = time.time()
+            request = jobs[index]
+            board = results[index].get('board')
+            if board:
+                request = dict(request, probe=board['probe'], chip_uid=board['chip_uid'], retry=True)
+            try:
+                reply = self._request(agent, request, timeout=self.timeout)
+            except (OSError, ValueError) as e:
+                reply = {'ok': False, 'error': str(e), 'agent_down': True}
+
+            with condition:
+                running -= 1
+                if reply.get('busy'):
+                    # Another controller took the probe; not a failed attempt
+                    if agent in free:
+                        free[agent] = 0
+                    pending.append(index)
+                elif reply.get('no_board'):
+                    # Nobody changed the board in time; not a failed attempt
+                    out.warning(f"{agent} probe {reply.get('probe')}: {reply.get('error')}")
+                    if agent in free:
+                        free[agent] += 1
+                    pending.append(index)
+                else:
+                    if reply.get('agent_down'):
+                        free.pop(agent, None)
+                    elif agent in free:
+                        free[agent] += 1
+                    passed = reply.get('ok') and reply.get('exit_code') == 0
+                    results[index]['attempts'].append({
+                        'agent': agent,
+                        'probe': reply.get('probe'),
+                        'chip_uid': reply.get('chip_uid'),
+                        'passed': bool(passed),
+                        'seconds': round(time.time() - start, 3),
+                        'error': reply.get('error'),
+                    })
+                    results[index]['passed'] = bool(passed)
+                    if 'chip_uid' in reply:
+                        results[index]['board'] = {'agent': agent, 'probe': reply['probe'],
+                                                   'chip_uid': reply['chip_uid']}
+                    if not passed and len(results[index]['attempts']) < self.max_attempts \
+                            and not reply.get('board_gone'):
+                        if 'chip_uid' in reply:
+                            # Retry the same board first, before its probe takes a new job
+                            pending.appendleft(index)
+                        elif 'board' not in results[index]:
+                            # Failed before a board was used, e.g. OpenOCD did not start
+                            pending.append(index)
+                    uid = reply.get('chip_uid')
+                    out.info(f"{results[index]['name']} on {agent}"
+                             + (f" (board {uid})" if uid else "")
+                             + f": {'passed' if passed else 'failed'}")
+                condition.notify_all()
+
+        with condition:
+            while pending or running:
+                dispatched = False
+                for _ in range(len(pending)):
+                    index = pending.popleft()
+                    board = results[index].get('board')
+                    if board and board['agent'] not in free:
+                        out.error(f"{results[index]['name']}: agent {board['agent']} of the failed board is gone")
+                        continue
+                    agent = self._pick_agent(free, results[index])
+                    if agent is None:
+                        pending.append(index)
+                        continue
+                    free[agent] -= 1
+                    running += 1
+                    dispatched = True
+                    threading.Thread(target=worker, args=(index, agent), daemon=True).start()
+
+                if not free and not running:
+                    out.error("No agent available, giving up on the remaining jobs")
+                    break
+                if not dispatched:
+                    condition.wait(timeout=1)
+                    if not running and pending:
+                        # Probes may have been freed by other controllers
+                        free.clear()
+                        free.update(self.free_probes())
+        return results
+
+    def _pick_agent(self, free, result):
+        """Choose an agent with a free probe for a job
+
+        A failed board can only go back to its own agent; a job without a
+        board avoids agents it already failed on.
+        """
+        board = result.get('board')
+        if board:
+            return board['agent'] if free.get(board['agent'], 0) > 0 else None
+        tried = {attempt['agent'] for attempt in result['attempts']}
+        candidates = [agent for agent, count in free.items() if count > 0]
+        fresh = [agent for agent in candidates if agent not in tried]
+        pool = fresh or ([] if any(agent not in tried for agent in free) else candidates)
+        if not pool:
+            return None
+        return max(pool, key=lambda agent: free[agent])
+
+
+def main():
+    """Farm entry point"""
+    parser = argparse.ArgumentParser(description='Multi-host flashing farm')
+    subparsers = parser.add_subparsers(dest='role', required=True)
+
+    agent_parser = subparsers.add_parser('agent', help='Serve the probes of this host')
+    agent_parser.add_argument('--probes', required=True, help='Comma separated probe serial numbers')
+    agent_parser.add_argument('--bind', default='127.0.0.1',
+                              help='Address to listen on (use 0.0.0.0 for remote controllers)')
+    agent_parser.add_argument('--port', type=int, default=DEFAULT_AGENT_PORT, help='TCP port of the job API')
+    agent_parser.add_argument('--telnet-base-port', type=int, default=BASE_TELNET_PORT,
+                              help='OpenOCD telnet port of the first probe')
+    agent_parser.add_argument('--interface', default='interface/stlink.cfg', help='OpenOCD interface config')
+    agent_parser.add_argument('--openocd-bin', default='openocd', help='OpenOCD executable')
+    agent_parser.add_argument('--token', help='Shared secret required from controllers')
+    agent_parser.add_argument('--board-timeout', type=float, default=BOARD_TIMEOUT,
+                              help='Seconds to wait for a board change before returning a job')
+
+    controller_parser = subparsers.add_parser('controller', help='Dispatch config jobs to agents')
+    controller_parser.add_argument('configs', nargs='+', help='Config files to run')
+    controller_parser.add_argument('--agents', required=True, help='Comma separated host:port list')
+    controller_parser.add_argument('--count', type=int, default=1, help='Boards to run per config')
+    controller_parser.add_argument('--attempts', type=int, default=2, help='Attempts per board')
+    controller_parser.add_argument('--token', help='Shared secret of the agents')
+
+    args = parser.parse_args()
+
+    if args.role == 'agent':
+        agent = FarmAgent(args.probes.split(','), args.interface, args.openocd_bin,
+                          args.telnet_base_port, args.token, args.board_timeout)
+        server = AgentServer(agent, args.bind, args.port)
+        out.header(f"Farm agent on {args.bind}:{args.port} serving {len(agent.slots)} probe(s)")
+
+        def terminate(signum, frame):
+            # Service stop or kill: OpenOCD children must not outlive the agent
+            agent.close()
+            raise SystemExit(0)
+
+        signal.signal(signal.SIGTERM, terminate)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            out.warning("\nAgent stopped by user")
+        finally:
+            server.server_close()
+            agent.close()
+        return 0
+
+    try:
+        jobs = [build_job(path) for path in args.configs for _ in range(args.count)]
+    except (ValueError, FileNotFoundError) as e:
+        out.error(str(e))
+        return 1
+
+    controller = FarmController(args.agents.split(','), args.token, args.attempts)
+    start = time.time()
+    results = controller.run(jobs)
+    passed = sum(1 for result in results if result['passed'])
+    retried = sum(1 for result in results if len(result['attempts']) > 1)
+    out.header(f"\n{passed}/{len(results)} board(s) passed, {retried} retried, "
+               f"{time.time() - start:.1f}s total")
+    for result in results:
+        if not result['passed']:
+            errors = [attempt['error'] for attempt in result['attempts'] if attempt['error']]
+            board = result.get('board')
+            out.error(f"  {result['name']}: failed after {len(result['attempts'])} attempt(s)"
+                      + (f" on {board['agent']} probe {board['probe']} board {board['chip_uid']}" if board else "")
+                      + (f" ({errors[-1]})" if errors else ""))
+    return 0 if passed == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""Flash History - SQLite record of every config run for cross-run analytics
+
+Runs are queued by the executor and written by a background thread in
+batched transactions, so recording never blocks the flash flow. Image files
+are hashed by the writer thread as well.
+
+    python3 history.py report --days 30
+"""
+
+import argparse
+import hashlib
+import os
+import queue
+import socket
+import sqlite3
+import statistics
+import sys
+import threading
+import time
+from output import out
+
+DEFAULT_DB_PATH = os.path.join(os.path.expanduser("~"), ".openocd_automation", "history.sqlite3")
+
+# Step durations this many MADs above the group median are outliers
+OUTLIER_THRESHOLD = 5.0
+
+# A board or probe is flagged when it is this much slower than the reference
+REGRESSION_RATIO = 1.3
+
+# Steps shorter than this are dominated by jitter and never flagged as slow
+MIN_COMPARED_SECONDS = 0.5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    duration REAL NOT NULL,
+    host TEXT,
+    target TEXT,
+    probe_serial TEXT,
+    chip_uid TEXT,
+    result TEXT NOT NULL,
+    retries INTEGER NOT NULL,
+    resumes INTEGER NOT NULL,
+    bytes_programmed INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS steps (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    step_index INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    command TEXT,
+    image_hash TEXT,
+    started REAL NOT NULL,
+    duration REAL NOT NULL,
+    bytes INTEGER NOT NULL,
+    retries INTEGER NOT NULL,
+    resumes INTEGER NOT NULL,
+    passed INTEGER NOT NULL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_started ON runs(started);
+CREATE INDEX IF NOT EXISTS idx_runs_probe ON runs(probe_serial, started);
+CREATE INDEX IF NOT EXISTS idx_runs_chip ON runs(chip_uid, started);
+CREATE INDEX IF NOT EXISTS idx_steps_run ON steps(run_id);
+CREATE INDEX IF NOT EXISTS idx_steps_type ON steps(type, image_hash, started);
+"""
+
+
+def open_database(path):
+    """Open (and create if needed) the history database"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30)
+    # WAL lets reports and other stations read while a station writes
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def command_files(cmd):
+    """Return the image files a config command programs or verifies"""
+    if cmd['type'] in ('flash', 'verify') and cmd.get('filepath'):
+        return [cmd['filepath']]
+    if cmd['type'] == 'manifest':
+        return [filepath for filepath, _ in cmd['images']]
+    if cmd['type'] == 'serialize':
+        return [cmd['image']]
+    return []
+
+
+class RunRecorder:
+    """Collect the steps of one config run for the history database"""
+
+    def __init__(self, history, manager):
+        self.history = history
+        self.manager = manager
+        self.started = time.time()
+        # Both are known before the run; no target I/O on the flash path
+        self.chip_uid = manager.chip_uid
+        self.probe_serial = manager.serial
+        self.steps = []
+        self._bytes = manager.bytes_programmed
+        self._retries = manager.command_retries
+        self._current = None
+
+    def begin_step(self, index):
+        """Start a step; calling again for the same step counts a resume"""
+        if self._current and self._current['step_index'] == index:
+            self._current['resumes'] += 1
+            return
+        self._current = {
+            'step_index': index,
+            'started': time.time(),
+            'bytes': self.manager.bytes_programmed,
+            'retries': self.manager.command_retries,
+            'resumes': 0,
+        }
+
+    def end_step(self, cmd, command, passed, error=None):
+        """Finish the current step"""
+        step = self._current
+        self.steps.append({
+            'step_index': step['step_index'],
+            'type': cmd['type'],
+            'command': command,
+            'files': command_files(cmd),
+            'started': step['started'],
+            'duration': time.time() - step['started'],
+            'bytes': self.manager.bytes_programmed - step['bytes'],
+            'retries': self.manager.command_retries - step['retries'],
+            'resumes': step['resumes'],
+            'passed': passed,
+            'error': error,
+        })
+        self._current = None
+
+    def finish(self, passed):
+        """Queue the run for the writer thread"""
+        self.history.record_run({
+            'started': self.started,
+            'duration': time.time() - self.started,
+            'host': socket.gethostname(),
+            'target': self.manager.target_cfg,
+            'probe_serial': self.probe_serial,
+            'chip_uid': self.chip_uid,
+            'result': 'passed' if passed else 'failed',
+            'retries': self.manager.command_retries - self._retries,
+            'resumes': sum(step['resumes'] for step in self.steps),
+            'bytes_programmed': self.manager.bytes_programmed - self._bytes,
+        }, self.steps)
+
+
+class FlashHistory:
+    """Asynchronous, batched writer of runs into the history database"""
+
+    def __init__(self, path=DEFAULT_DB_PATH, batch_size=50, flush_interval=1.0):
+        """
+        Args:
+            path: SQLite database file
+            batch_size: Maximum runs written per transaction
+            flush_interval: Seconds to wait for more runs before writing a batch
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._hashes = {}
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def record_run(self, run, steps):
+        """Queue a run and its steps; returns immediately"""
+        self._queue.put((run, steps))
+
+    def close(self):
+        """Write all queued runs and stop the writer"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        try:
+            connection = open_database(self.path)
+        except sqlite3.Error as e:
+            out.warning(f"Flash history disabled, cannot open {self.path}: {e}")
+            return
+
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            deadline = time.time() + self.flush_interval
+            while batch[-1] is not None and len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0, deadline - time.time())))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                batch.pop()
+                stopping = True
+            if batch:
+                try:
+                    self._write(connection, batch)
+                except sqlite3.Error as e:
+                    out.warning(f"Could not write flash history: {e}")
+        connection.close()
+
+    def _write(self, connection, batch):
+        """Insert a batch of runs in one transaction"""
+        with connection:
+            for run, steps in batch:
+                cursor = connection.execute(
+                    "INSERT INTO runs (started, duration, host, target, probe_serial, chip_uid, result, "
+                    "retries, resumes, bytes_programmed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (run['started'], run['duration'], run['host'], run['target'], run['probe_serial'],
+                     run['chip_uid'], run['result'], run['retries'], run['resumes'], run['bytes_programmed']))
+                connection.executemany(
+                    "INSERT INTO steps (run_id, step_index, type, command, image_hash, started, duration, "
+                    "bytes, retries, resumes, passed, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(cursor.lastrowid, step['step_index'], step['type'], step['command'],
+                      self._image_hash(step['files']), step['started'], step['duration'], step['bytes'],
+                      step['retries'], step['resumes'], int(step['passed']), step['error'])
+                     for step in steps])
+
+    def _image_hash(self, paths):
+        """Return the SHA-256 of the image files (comma separated), cached by mtime and size"""
+        hashes = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            key = (path, stat.st_mtime, stat.st_size)
+            if key not in self._hashes:
+                digest = hashlib.sha256()
+                with open(path, 'rb') as f:
+                    for block in iter(lambda: f.read(1024 * 1024), b""):
+                        digest.update(block)
+                self._hashes[key] = digest.hexdigest()
+            hashes.append(self._hashes[key])
+        return ",".join(hashes) or None
+
+
+def _mad_outliers(rows, threshold=OUTLIER_THRESHOLD):
+    """Return the rows whose duration is far above their group median
+
+    Args:
+        rows: (group key, duration, row) tuples
+
+    Returns:
+        list: (row, group median, robust score) tuples, worst first
+    """
+    groups = {}
+    for key, duration, row in rows:
+        groups.setdefault(key, []).append((duration, row))
+
+    outliers = []
+    for samples in groups.values():
+        if len(samples) < 5:
+            continue
+        durations = [duration for duration, _ in samples]
+        median = statistics.median(durations)
+        # A floor keeps perfectly stable groups from flagging jitter
+        mad = max(statistics.median(abs(d - median) for d in durations), median * 0.01, 1e-3)
+        for duration, row in samples:
+            score = (duration - median) / (1.4826 * mad)
+            if score > threshold:
+                outliers.append((row, median, score))
+    return sorted(outliers, key=lambda outlier: -outlier[2])
+
+
+def print_report(path=DEFAULT_DB_PATH, days=30, probe=None, limit=10):
+    """Print throughput trends, slow probes, board regressions and outliers"""
+    if not os.path.exists(path):
+        out.error(f"No flash history at {path}")
+        return 1
+    connection = open_database(path)
+    since = time.time() - days * 86400
+    probe_filter = " AND r.probe_serial = ?" if probe else ""
+    params = (since, probe) if probe else (since,)
+
+    out.header(f"Flash History - last {days} day(s)" + (f", probe {probe}" if probe else ""))
+    out.header("=" * 50)
+
+    out.info("\nDaily throughput:")
+    out.plain(f"  {'day':<10} {'runs':>5} {'pass %':>7} {'avg run':>8} {'KB/s':>8}")
+    day = "date(r.started, 'unixepoch', 'localtime')"
+    throughput = dict(connection.execute(
+        f"SELECT {day}, SUM(s.bytes) / 1024.0 / SUM(s.duration) FROM steps s JOIN runs r ON s.run_id = r.id "
+        "WHERE s.bytes > 0 AND r.started >= ?" + probe_filter + f" GROUP BY {day}", params).fetchall())
+    rows = connection.execute(
+        f"SELECT {day}, COUNT(*), AVG(r.result = 'passed') * 100, AVG(r.duration) FROM runs r "
+        "WHERE r.started >= ?" + probe_filter + f" GROUP BY {day} ORDER BY {day}", params).fetchall()
+    for date, runs, pass_rate, avg_duration in rows:
+        out.plain(f"  {date:<10} {runs:>5} {pass_rate:>6.1f}% {avg_duration:>7.2f}s "
+                  f"{throughput.get(date) or 0:>8.1f}")
+
+    # Probes that are consistently slower on the same step and image
+    steps = connection.execute(
+        "SELECT s.type, s.image_hash, r.probe_serial, r.chip_uid, s.duration, r.id, r.started "
+        "FROM steps s JOIN runs r ON s.run_id = r.id "
+        "WHERE s.passed = 1 AND r.started >= ?" + probe_filter + " ORDER BY r.started",
+        params).fetchall()
+    by_group = {}
+    for step_type, image_hash, probe_serial, _, duration, _, _ in steps:
+        by_group.setdefault((step_type, image_hash), {}).setdefault(probe_serial, []).append(duration)
+
+    out.info(f"\nProbes over {REGRESSION_RATIO:.1f}x the median probe for a step and image:")
+    found = False
+    for (step_type, image_hash), probes in sorted(by_group.items(), key=lambda item: str(item[0])):
+        if len(probes) < 2:
+            continue
+        means = {serial: statistics.mean(durations) for serial, durations in probes.items()}
+        reference = statistics.median(means.values())
+        for serial, mean in means.items():
+            if mean >= MIN_COMPARED_SECONDS and mean > reference * REGRESSION_RATIO:
+                found = True
+                out.warning(f"  {serial}: {step_type} ({(image_hash or '-')[:12]}) "
+                            f"{mean:.2f}s vs {reference:.2f}s")
+    if not found:
+        out.plain("  none")
+
+    # Boards whose latest run of a step is slower than their own history
+    by_board = {}
+    for step_type, image_hash, _, chip_uid, duration, _, _ in steps:
+        if chip_uid:
+            by_board.setdefault((chip_uid, step_type, image_hash), []).append(duration)
+
+    out.info(f"\nBoards whose latest step took over {REGRESSION_RATIO:.1f}x their earlier average:")
+    found = False
+    for (chip_uid, step_type, image_hash), durations in sorted(by_board.items()):
+        if len(durations) < 3:
+            continue
+        earlier = statistics.mean(durations[:-1])
+        if earlier > 0 and durations[-1] >= MIN_COMPARED_SECONDS \
+                and durations[-1] > earlier * REGRESSION_RATIO:
+            found = True
+            out.warning(f"  {chip_uid}: {step_type} {durations[-1]:.2f}s vs {earlier:.2f}s "
+                        f"(+{(durations[-1] / earlier - 1) * 100:.0f}%)")
+    if not found:
+        out.plain("  none")
+
+    out.info(f"\nSlowest outlier steps (> {OUTLIER_THRESHOLD:g} MADs above the median):")
+    outliers = _mad_outliers(((step[0], step[1]), step[4], step) for step in steps)
+    for (step_type, _, probe_serial, chip_uid, duration, run_id, started), median, score in outliers[:limit]:
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(started))
+        out.warning(f"  run {run_id} {when} {step_type}: {duration:.2f}s (median {median:.2f}s) "
+                    f"probe {probe_serial} chip {chip_uid or '-'}")
+    if not outliers:
+        out.plain("  none")
+
+    connection.close()
+    return 0
+
+
+def main():
+    """History report entry point"""
+    parser = argparse.ArgumentParser(description='Flash history analytics')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    report_parser = subparsers.add_parser('report', help='Throughput trends and outliers')
+    report_parser.add_argument('--db', default=DEFAULT_DB_PATH, help='History database file')
+    report_parser.add_argument('--days', type=int, default=30, help='Days of history to include')
+    report_parser.add_argument('--probe', help='Only runs on this probe serial')
+    report_parser.add_argument('--limit', type=int, default=10, help='Outliers to show')
+    args = parser.parse_args()
+    return print_report(args.db, args.days, args.probe, args.limit)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
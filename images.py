@@ -0,0 +1,88 @@
+"""Images - Load firmware files (raw binary, Intel HEX, ELF) as address segments"""
+
+import os
+import struct
+
+IMAGE_TYPES = {'.bin': 'bin', '.hex': 'ihex', '.ihex': 'ihex', '.elf': 'elf', '.axf': 'elf', '.out': 'elf'}
+
+
+class ImageError(ValueError):
+    """Raised when an image file cannot be interpreted"""
+
+
+def image_type(path):
+    """Return 'bin', 'ihex' or 'elf' from the file name, or the content for unknown extensions"""
+    known = IMAGE_TYPES.get(os.path.splitext(path)[1].lower())
+    if known:
+        return known
+    with open(path, 'rb') as f:
+        head = f.read(4)
+    return 'elf' if head == b"\x7fELF" else 'ihex' if head[:1] == b":" else 'bin'
+
+
+def load_image(path, offset=None, kind=None):
+    """Read an image file into (address, bytes) segments
+
+    The offset places raw binaries; ELF and Intel HEX images carry their own
+    addresses.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"couldn't open {path}")
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    kind = kind or image_type(path)
+    if kind == 'bin':
+        return [(offset or 0, data)]
+    if kind == 'ihex':
+        return _parse_ihex(data.decode('ascii', 'replace'))
+    if kind == 'elf':
+        return _parse_elf(data)
+    raise ImageError(f"unknown image type {kind}")
+
+
+def _parse_ihex(text):
+    """Parse Intel HEX data records into segments"""
+    segments = []
+    base = 0
+    for line in text.split():
+        record = bytes.fromhex(line[1:])
+        length, address, kind = record[0], int.from_bytes(record[1:3], 'big'), record[3]
+        payload = record[4:4 + length]
+        if kind == 0:
+            address += base
+            if segments and segments[-1][0] + len(segments[-1][1]) == address:
+                segments[-1][1].extend(payload)
+            else:
+                segments.append((address, bytearray(payload)))
+        elif kind == 1:
+            break
+        elif kind == 2:
+            base = int.from_bytes(payload, 'big') << 4
+        elif kind == 4:
+            base = int.from_bytes(payload, 'big') << 16
+    return [(address, bytes(data)) for address, data in segments]
+
+
+def _parse_elf(data):
+    """Return the loadable segments of an ELF file at their load addresses"""
+    is_64 = data[4] == 2
+    endian = '<' if data[5] == 1 else '>'
+    if is_64:
+        phoff, = struct.unpack_from(endian + 'Q', data, 0x20)
+        phentsize, phnum = struct.unpack_from(endian + 'HH', data, 0x36)
+    else:
+        phoff, = struct.unpack_from(endian + 'I', data, 0x1C)
+        phentsize, phnum = struct.unpack_from(endian + 'HH', data, 0x2A)
+
+    segments = []
+    for index in range(phnum):
+        if is_64:
+            p_type, _, p_offset, _, p_paddr, p_filesz = struct.unpack_from(
+                endian + 'IIQQQQ', data, phoff + index * phentsize)
+        else:
+            p_type, p_offset, _, p_paddr, p_filesz = struct.unpack_from(
+                endian + 'IIIII', data, phoff + index * phentsize)
+        if p_type == 1 and p_filesz:  # PT_LOAD
+            segments.append((p_paddr, data[p_offset:p_offset + p_filesz]))
+    return segments
@@ -5,31 +5,145 @@ Main entry point for the application
 """
 
 import sys
+import time
 import argparse
+import functools
 from openocd_manager import OpenOCDManager
 from ui import select_target, run_interactive_loop
-from colors import header, error, success, info
+from output import out
 from config_parser import ConfigParser
+from adapter_speed import AdapterSpeedTuner
+from station import ProductionStation
+from serialization import Serializer
+from symbols import SymbolIndex, parse_address
+from recovery import classify_failure, RunCheckpoint, TRANSIENT
+from metrics import METRICS, MetricsServer, JsonSnapshotWriter
+from emulator import EmulatedTarget, EmulatedTransport
+from history import FlashHistory, RunRecorder, DEFAULT_DB_PATH
 
 VERSION = "0.008"
 
+# Reconnect-and-resume attempts per run before a transient failure is fatal
+MAX_RESUMES = 3
 
-def execute_config_commands(manager, commands):
+
+def run_config_command(manager, cmd, progress=None):
+    """Execute a single command from a config file
+
+    Args:
+        manager: OpenOCDManager instance
+        cmd: Command dictionary
+        progress: Dict kept across resumes of this command (chunked flashing)
+
+    Returns:
+        OpenOCD response or result of the command (None if it has none)
+
+    Raises:
+        ValueError: If the command or its parameters are invalid
+    """
+    cmd_type = cmd['type']
+    response = None
+
+    if cmd_type == 'halt':
+        response = manager.halt()
+
+    elif cmd_type == 'reset_halt':
+        response = manager.reset_halt()
+
+    elif cmd_type == 'reset_run':
+        response = manager.reset_run()
+
+    elif cmd_type == 'erase_flash':
+        response = manager.erase_flash()
+
+    elif cmd_type == 'flash':
+        filepath = cmd.get('filepath')
+        address = cmd.get('address')
+        # Convert address string to int if provided
+        if address:
+            address = int(address, 16) if address.startswith('0x') else int(address, 16)
+        response = manager.flash_firmware_resumable(filepath, address, progress)
+
+    elif cmd_type == 'verify':
+        filepath = cmd.get('filepath')
+        address = cmd.get('address')
+        # Convert address string to int if provided
+        if address:
+            address = int(address, 16) if address.startswith('0x') else int(address, 16)
+        response = manager.verify_firmware(filepath, address)
+
+    elif cmd_type == 'read_memory':
+        address_str = cmd.get('address')
+        count_str = cmd.get('count')
+        if not address_str:
+            raise ValueError("Invalid read_memory parameters")
+        address, size = parse_address(address_str, manager.symbols)
+        # Symbols default to reading the whole variable
+        count = int(count_str) if count_str else max(1, -(-(size or 0) // 4))
+        response = manager.read_memory(address, count)
+
+    elif cmd_type == 'write_memory':
+        address_str = cmd.get('address')
+        value_str = cmd.get('value')
+        if not (address_str and value_str):
+            raise ValueError("Invalid write_memory parameters")
+        address, _ = parse_address(address_str, manager.symbols)
+        value = int(value_str, 16) if value_str.startswith('0x') else int(value_str, 16)
+        response = manager.write_memory(address, value)
+
+    elif cmd_type == 'manifest':
+        response = manager.flash_manifest(cmd['images'], cmd.get('force', False), progress)
+
+    elif cmd_type == 'serialize':
+        response = Serializer(cmd, reserve=not manager.dry_run).run(manager, progress)
+
+    elif cmd_type == 'rtt_start':
+        port = int(cmd['port']) if cmd.get('port') else 9090
+        channel = int(cmd['channel']) if cmd.get('channel') else 0
+        manager.rtt_start(cmd.get('filepath') or "rtt.log", port, channel)
+
+    elif cmd_type == 'rtt_stop':
+        response = manager.rtt_stop()
+
+    elif cmd_type == 'custom':
+        response = manager.custom_command(cmd.get('param'))
+
+    else:
+        raise ValueError(f"Unknown command type: {cmd_type}")
+
+    return response
+
+
+def execute_config_commands(manager, commands, timings=None, history=None):
     """Execute commands from config file
 
+    Transient failures (lost OpenOCD session, link errors) reconnect and
+    resume from the failed command; large images resume from the last
+    verified chunk. Only fatal failures erase the flash.
+
     Args:
         manager: OpenOCDManager instance
         commands: List of command dictionaries
+        timings: Optional list that receives a (command type, seconds, passed)
+            tuple for every executed command
+        history: Optional FlashHistory that records the run
 
     Returns:
         int: 0 on success, 1 on failure
     """
-    print(info(f"\nExecuting {len(commands)} commands from config file...\n"))
+    out.info(f"\nExecuting {len(commands)} commands from config file...\n")
+    out.begin_run(version=VERSION, target=manager.target_cfg, probe_serial=manager.serial)
 
     failed = False
     error_message = None
-
-    for i, cmd in enumerate(commands, 1):
+    checkpoint = RunCheckpoint()
+    # The manager's counters span all boards of a station or farm agent
+    cache_hits, cache_misses = manager.read_cache_hits, manager.read_cache_misses
+    recorder = RunRecorder(history, manager) if history else None
+
+    while checkpoint.step < len(commands):
+        i = checkpoint.step + 1
+        cmd = commands[checkpoint.step]
         cmd_type = cmd['type']
 
         # Build display message
@@ -44,101 +158,101 @@ def execute_config_commands(manager, commands):
                 display_parts.append(f"count:{cmd['count']}")
             elif cmd.get('value'):
                 display_parts.append(cmd['value'])
+        elif 'image' in cmd:
+            display_parts.append(f"{cmd['image']} {cmd['source']} at {cmd['patch']}")
+        elif 'images' in cmd:
+            display_parts.extend(f"{filepath}@0x{address:08x}" for filepath, address in cmd['images'])
         elif 'param' in cmd and cmd['param']:
             display_parts.append(cmd['param'])
 
-        print(info(f"[{i}/{len(commands)}] Executing: {' '.join(display_parts)}"))
+        out.info(f"[{i}/{len(commands)}] Executing: {' '.join(display_parts)}")
 
+        step_start = time.time()
+        if recorder:
+            recorder.begin_step(checkpoint.step)
         try:
-            if cmd_type == 'halt':
-                manager.halt()
-
-            elif cmd_type == 'reset_halt':
-                manager.reset_halt()
-
-            elif cmd_type == 'reset_run':
-                manager.reset_run()
-
-            elif cmd_type == 'erase_flash':
-                manager.erase_flash()
-
-            elif cmd_type == 'flash':
-                filepath = cmd.get('filepath')
-                address = cmd.get('address')
-                # Convert address string to int if provided
-                if address:
-                    address = int(address, 16) if address.startswith('0x') else int(address, 16)
-                manager.flash_firmware(filepath, address)
-
-            elif cmd_type == 'verify':
-                filepath = cmd.get('filepath')
-                address = cmd.get('address')
-                # Convert address string to int if provided
-                if address:
-                    address = int(address, 16) if address.startswith('0x') else int(address, 16)
-                manager.verify_firmware(filepath, address)
-
-            elif cmd_type == 'read_memory':
-                address_str = cmd.get('address')
-                count_str = cmd.get('count')
-                if address_str:
-                    address = int(address_str, 16) if address_str.startswith('0x') else int(address_str, 16)
-                    count = int(count_str) if count_str else 1
-                    manager.read_memory(address, count)
-                else:
-                    error_message = "Invalid read_memory parameters"
-                    print(error(error_message))
-                    failed = True
-                    break
-
-            elif cmd_type == 'write_memory':
-                address_str = cmd.get('address')
-                value_str = cmd.get('value')
-                if address_str and value_str:
-                    address = int(address_str, 16) if address_str.startswith('0x') else int(address_str, 16)
-                    value = int(value_str, 16) if value_str.startswith('0x') else int(value_str, 16)
-                    manager.write_memory(address, value)
-                else:
-                    error_message = "Invalid write_memory parameters"
-                    print(error(error_message))
-                    failed = True
-                    break
-
-            elif cmd_type == 'custom':
-                manager.custom_command(cmd.get('param'))
-
-            else:
-                error_message = f"Unknown command type: {cmd_type}"
-                print(error(error_message))
-                failed = True
-                break
+            response = run_config_command(manager, cmd, checkpoint.chunk_progress(checkpoint.step))
 
         except Exception as e:
+            if classify_failure(e) == TRANSIENT and checkpoint.resumes < MAX_RESUMES:
+                checkpoint.resumes += 1
+                METRICS.inc('step_resumes_total', step=cmd_type)
+                out.warning(f"Transient failure: {e}")
+                out.warning(f"Reconnecting and resuming from step {i} "
+                            f"(attempt {checkpoint.resumes}/{MAX_RESUMES})...")
+                manager.reconnect()
+                continue
+
             error_message = f"Error executing command: {e}"
-            print(error(error_message))
+            out.error(error_message)
+            out.add_error(error_message)
             failed = True
             break
 
-        print()  # Add blank line between commands
+        METRICS.observe('step_seconds', time.time() - step_start, step=cmd_type)
+        out.step(i, cmd_type, ' '.join(display_parts), time.time() - step_start, True, response)
+        if timings is not None:
+            timings.append((cmd_type, time.time() - step_start, True))
+        if recorder:
+            recorder.end_step(cmd, ' '.join(display_parts), True)
+        checkpoint.step += 1
+        out.plain()  # Add blank line between commands
+
+    cache_hits = manager.read_cache_hits - cache_hits
+    cache_misses = manager.read_cache_misses - cache_misses
+    lookups = cache_hits + cache_misses
+    if lookups:
+        out.info(f"Read cache: {cache_hits} hit(s), {cache_misses} miss(es)")
 
     # If any command failed, perform flash erase
     if failed:
+        METRICS.observe('step_seconds', time.time() - step_start, step=cmd_type)
+        METRICS.inc('boards_total', result='failed')
+        out.step(i, cmd_type, ' '.join(display_parts), time.time() - step_start, False,
+                 error_text=error_message)
+        if timings is not None:
+            timings.append((cmd_type, time.time() - step_start, False))
+        if recorder:
+            recorder.end_step(cmd, ' '.join(display_parts), False, error_message)
         remaining = len(commands) - i
         if remaining > 0:
-            print(error(f"\nSkipping {remaining} remaining command(s) due to failure"))
-        print(error("\nPerforming flash erase due to command failure..."))
+            out.error(f"\nSkipping {remaining} remaining command(s) due to failure")
+        out.error("\nPerforming flash erase due to command failure...")
         try:
+            if not manager.connected:
+                manager.reconnect()
             manager.erase_flash()
-            print(success("Flash erase completed"))
+            out.success("Flash erase completed")
         except Exception as erase_error:
-            print(error(f"Flash erase failed: {erase_error}"))
-        print(error("\nTask Failed"))
+            out.error(f"Flash erase failed: {erase_error}")
+            out.add_error(f"Flash erase failed: {erase_error}")
+        out.error("\nTask Failed")
+        if recorder:
+            recorder.finish(False)
+        out.end_run(1)
         return 1
 
-    print(success("All commands executed successfully!"))
+    METRICS.inc('boards_total', result='passed')
+    out.success("All commands executed successfully!")
+    if recorder:
+        recorder.finish(True)
+    out.end_run(0)
     return 0
 
 
+def print_dry_run_report(transport):
+    """Print the operations recorded by the emulated target"""
+    report = transport.report()
+    out.header("\nDry Run Report")
+    out.header("=" * 50)
+    for command, length, seconds in transport.operations:
+        out.plain(f"  {command[:60]:<60} {length:>9} B {seconds:>8.3f}s")
+    out.info(f"\n{report['commands']} command(s) in {report['elapsed_seconds']:.3f}s")
+    for verb, count in sorted(report['counts'].items()):
+        out.info(f"  {verb}: {count}x, {report['bytes'][verb]} bytes")
+    out.success(f"Estimated time on hardware: {report['estimated_seconds']:.2f}s")
+
+
 def main():
     """Main application entry point"""
     # Parse command-line arguments
@@ -151,31 +265,101 @@ def main():
         nargs='?',
         help='Path to configuration file for automated operation'
     )
+    parser.add_argument(
+        '--probe-serial',
+        help='Serial number of the debug probe to use (default: first probe found)'
+    )
+    parser.add_argument(
+        '--calibrate-speed',
+        action='store_true',
+        help='Find the fastest reliable adapter speed for this probe and cache it'
+    )
+    parser.add_argument(
+        '--elf',
+        help='ELF file of the firmware, enables symbol names in memory commands'
+    )
+    parser.add_argument(
+        '--station',
+        action='store_true',
+        help='Production station mode: run the config on every inserted board until Ctrl+C'
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Run against an emulated target instead of OpenOCD and report the operations'
+    )
+    parser.add_argument(
+        '--latency',
+        choices=['zero', 'realistic'],
+        default='zero',
+        help='Emulated target latency in --dry-run (default: zero)'
+    )
+    parser.add_argument(
+        '--quiet',
+        action='store_true',
+        help='Print errors only'
+    )
+    parser.add_argument(
+        '--json',
+        action='store_true',
+        help='Write one JSON result document per config run to stdout (errors go to stderr)'
+    )
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        help='Serve Prometheus metrics on http://127.0.0.1:PORT/metrics'
+    )
+    parser.add_argument(
+        '--metrics-json',
+        help='Write a JSON metrics snapshot to this file every 10 seconds'
+    )
+    parser.add_argument(
+        '--history',
+        action='store_true',
+        help='Record every config run in the flash history database'
+    )
+    parser.add_argument(
+        '--history-db',
+        default=DEFAULT_DB_PATH,
+        help=f'Flash history database (default: {DEFAULT_DB_PATH})'
+    )
 
     args = parser.parse_args()
 
-    print(header(f"OpenOCD Manager v{VERSION}"))
-    print(header("="*50))
+    if args.station and not args.config:
+        parser.error("--station requires a config file")
+    if args.dry_run and (args.station or args.calibrate_speed or args.history):
+        parser.error("--dry-run cannot be combined with --station, --calibrate-speed or --history")
+    if args.json and not args.config:
+        parser.error("--json requires a config file")
+    out.configure(quiet=args.quiet, json_mode=args.json)
+
+    out.header(f"OpenOCD Manager v{VERSION}")
+    out.header("="*50)
 
     # Hardcoded interface configuration
     interface_cfg = "interface/stlink.cfg"
     port = 4444
     target_cfg = None
     commands = None
+    elf_path = args.elf
 
     # Determine mode: config file or interactive
     if args.config:
         # Config file mode
-        print(info(f"Loading config file: {args.config}\n"))
+        out.info(f"Loading config file: {args.config}\n")
         config_parser = ConfigParser(args.config)
         target_cfg, commands = config_parser.parse()
 
         if not target_cfg:
+            out.add_error(f"Invalid config file: {args.config}")
+            out.end_run(1)
             return 1
+        elf_path = elf_path or config_parser.elf
 
-        print(success(f"Target: {target_cfg}"))
+        out.success(f"Target: {target_cfg}")
         if commands:
-            print(info(f"Commands to execute: {len(commands)}"))
+            out.info(f"Commands to execute: {len(commands)}")
     else:
         # Interactive mode
         target_cfg = select_target()
@@ -183,33 +367,91 @@ def main():
             return 1
 
     # Initialize manager
-    manager = OpenOCDManager(interface_cfg=interface_cfg, target_cfg=target_cfg, port=port)
+    transport = None
+    if args.dry_run:
+        transport = EmulatedTransport(EmulatedTarget(target_cfg, args.probe_serial),
+                                      realistic_latency=args.latency == 'realistic')
+    manager = OpenOCDManager(interface_cfg=interface_cfg, target_cfg=target_cfg, port=port,
+                             serial=args.probe_serial, transport=transport)
+    manager.dry_run = args.dry_run
+    if elf_path:
+        # Parsed lazily on the first symbol lookup
+        manager.symbols = SymbolIndex(elf_path)
 
     # Start OpenOCD
     if not manager.start_openocd():
-        print(error("Failed to start OpenOCD. Exiting..."))
+        out.error("Failed to start OpenOCD. Exiting...")
+        out.add_error("Failed to start OpenOCD")
+        out.end_run(1)
         return 1
 
     # Connect via telnet
     if not manager.connect_telnet():
-        print(error("Failed to connect to OpenOCD. Stopping..."))
+        out.error("Failed to connect to OpenOCD. Stopping...")
+        out.add_error("Failed to connect to OpenOCD")
+        out.end_run(1)
         manager.stop_openocd()
         return 1
 
     # Execute based on mode
+    metrics_server = None
+    metrics_writer = None
+    history = None
+    executor = execute_config_commands
     try:
-        if commands is not None:
+        if args.metrics_port:
+            try:
+                metrics_server = MetricsServer(args.metrics_port)
+            except OSError as e:
+                out.error(f"Cannot serve metrics on port {args.metrics_port}: {e}")
+                out.add_error(f"Cannot serve metrics on port {args.metrics_port}: {e}")
+                out.end_run(1)
+                return 1
+            metrics_server.start()
+            out.info(f"Metrics: http://127.0.0.1:{args.metrics_port}/metrics")
+        if args.metrics_json:
+            metrics_writer = JsonSnapshotWriter(args.metrics_json)
+            metrics_writer.start()
+        if args.history and commands is not None:
+            history = FlashHistory(args.history_db)
+            history.start()
+            if not args.station:
+                # Station mode reads it for every detected board
+                manager.read_chip_uid()
+            executor = functools.partial(execute_config_commands, history=history)
+
+        # Use the calibrated adapter speed for this probe; dry runs and
+        # emulated targets have no adapter to tune
+        tuner = AdapterSpeedTuner(manager)
+        if args.calibrate_speed:
+            tuner.calibrate()
+        elif not manager.dry_run and manager.transport.requires_openocd:
+            tuner.apply_cached()
+
+        if args.station:
+            # Station mode - keep OpenOCD running and loop over boards
+            station = ProductionStation(manager, commands, executor)
+            return_code = station.run()
+        elif commands is not None:
             # Config file mode - execute commands
-            result = execute_config_commands(manager, commands)
+            result = executor(manager, commands)
             return_code = result
         else:
             # Interactive mode
             run_interactive_loop(manager)
             return_code = 0
     finally:
-        print(header("\nCleaning up..."))
+        out.header("\nCleaning up...")
         manager.stop_openocd()
-        print(success("Goodbye!"))
+        if metrics_server:
+            metrics_server.stop()
+        if metrics_writer:
+            metrics_writer.stop()
+        if history:
+            history.close()
+        if transport:
+            print_dry_run_report(transport)
+        out.success("Goodbye!")
 
     return return_code
 
@@ -0,0 +1,119 @@
+"""Flash Manifest - Multi-image bundles programmed as a single unit"""
+
+import hashlib
+import os
+from devices import sector_bounds
+
+# Images closer than this are merged even without sharing an erase sector;
+# padding a small gap is cheaper than an extra erase/program round trip
+MERGE_GAP = 4 * 1024
+
+ERASED_BYTE = b"\xff"
+
+
+class ManifestError(ValueError):
+    """Raised when the images of a manifest cannot be flashed together"""
+
+
+def coalesce_segments(segments, device):
+    """Merge image segments into the fewest contiguous program operations
+
+    Segments sharing an erase sector must be merged, otherwise erasing the
+    second would wipe the first. Gaps are filled with the erased value.
+
+    Args:
+        segments: (address, data) tuples inside the flash, sorted and not overlapping
+        device: Device description from devices.get_device()
+
+    Returns:
+        list: (address, data) tuples padded to the flash programming unit
+    """
+    merged = []
+    for address, data in segments:
+        if merged:
+            seg_address, seg_data = merged[-1]
+            seg_end = seg_address + len(seg_data)
+            shares_sector = sector_bounds(device, address)[0] < sector_bounds(device, seg_end - 1)[1]
+            if shares_sector or address - seg_end <= MERGE_GAP:
+                merged[-1] = (seg_address, seg_data + ERASED_BYTE * (address - seg_end) + data)
+                continue
+        merged.append((address, data))
+
+    # Pad every segment to the flash programming unit
+    align = device['write_align']
+    return [(address, data + ERASED_BYTE * (-len(data) % align)) for address, data in merged]
+
+
+class FlashManifest:
+    """A set of raw binary images at fixed addresses, flashed as one bundle"""
+
+    def __init__(self, images, device):
+        """
+        Args:
+            images: List of (filepath, address) tuples
+            device: Device description from devices.get_device()
+        """
+        self.images = images
+        self.device = device
+        self._contents = None
+
+    def _load(self):
+        """Load and validate all images
+
+        Raises:
+            FileNotFoundError: If an image file does not exist
+            ManifestError: If images are invalid, overlap or are misaligned
+        """
+        if self._contents is not None:
+            return self._contents
+
+        if not self.device:
+            raise ManifestError("Manifest flashing requires a known target family")
+        if not self.images:
+            raise ManifestError("Manifest contains no images")
+
+        contents = []
+        for filepath, address in self.images:
+            if not os.path.exists(filepath):
+                raise FileNotFoundError(f"Firmware file '{filepath}' not found")
+            if not filepath.lower().endswith('.bin'):
+                raise ManifestError(f"Manifest images must be raw .bin files: {filepath}")
+            with open(filepath, 'rb') as f:
+                data = f.read()
+            if not data:
+                raise ManifestError(f"Manifest image is empty: {filepath}")
+
+            end = address + len(data)
+            if sector_bounds(self.device, address) is None or sector_bounds(self.device, end - 1) is None:
+                raise ManifestError(f"{filepath} (0x{address:08x}-0x{end:08x}) is outside the "
+                                    f"{self.device['name']} flash")
+            if address % self.device['write_align']:
+                raise ManifestError(f"{filepath} at 0x{address:08x} is not aligned to the "
+                                    f"{self.device['write_align']} byte flash programming unit")
+            contents.append((address, filepath, data))
+
+        contents.sort()
+        for (addr_a, path_a, data_a), (addr_b, path_b, _) in zip(contents, contents[1:]):
+            if addr_a + len(data_a) > addr_b:
+                raise ManifestError(f"{path_a} (0x{addr_a:08x}-0x{addr_a + len(data_a):08x}) "
+                                    f"overlaps {path_b} (0x{addr_b:08x})")
+
+        self._contents = contents
+        return contents
+
+    def segments(self):
+        """Coalesce the images into the fewest contiguous program operations
+
+        Returns:
+            list: (address, data) tuples, sorted by address
+        """
+        return coalesce_segments([(address, data) for address, _, data in self._load()], self.device)
+
+    def fingerprint(self):
+        """Return a SHA-256 over all image addresses and contents"""
+        digest = hashlib.sha256()
+        for address, _, data in self._load():
+            digest.update(address.to_bytes(4, 'little'))
+            digest.update(len(data).to_bytes(4, 'little'))
+            digest.update(data)
+        return digest.hexdigest()
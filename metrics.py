@@ -0,0 +1,260 @@
+"""Metrics - Counters, gauges and histograms for fleet monitoring of stations
+
+Every thread updates its own shard without locking; readers merge the shards
+when a snapshot is taken. Snapshots are served as Prometheus text over HTTP
+and can be written periodically to a JSON file.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Default histogram bucket upper bounds (seconds)
+DEFAULT_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+
+class _Shard:
+    """Metric values updated by a single thread"""
+
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+
+class MetricsRegistry:
+    """Registry of metrics with lock-free per-thread updates"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+        self._descriptions = {}
+
+    def describe(self, name, kind, help_text, buckets=None):
+        """Declare a metric
+
+        Args:
+            name: Metric name (Prometheus naming)
+            kind: 'counter', 'gauge' or 'histogram'
+            help_text: One-line description
+            buckets: Histogram bucket upper bounds (default: DEFAULT_BUCKETS)
+        """
+        self._descriptions[name] = (kind, help_text, buckets or DEFAULT_BUCKETS)
+
+    def _shard(self):
+        """Return the calling thread's shard, registering it on first use"""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def inc(self, name, value=1, **labels):
+        """Increase a counter"""
+        counters = self._shard().counters
+        key = (name, tuple(sorted(labels.items())))
+        counters[key] = counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        """Set a gauge; the most recent value of any thread wins"""
+        self._shard().gauges[(name, tuple(sorted(labels.items())))] = (time.time(), value)
+
+    def observe(self, name, value, **labels):
+        """Record a histogram sample"""
+        histograms = self._shard().histograms
+        key = (name, tuple(sorted(labels.items())))
+        entry = histograms.get(key)
+        if entry is None:
+            buckets = self._descriptions.get(name, (None, None, DEFAULT_BUCKETS))[2]
+            entry = histograms[key] = [buckets, [0] * len(buckets), 0.0, 0]
+        buckets, counts = entry[0], entry[1]
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        entry[2] += value
+        entry[3] += 1
+
+    def snapshot(self):
+        """Merge all shards
+
+        Returns:
+            dict: 'counters', 'gauges' and 'histograms', keyed by (name, labels)
+        """
+        with self._lock:
+            shards = list(self._shards)
+
+        counters, gauges, histograms = {}, {}, {}
+        for shard in shards:
+            for key, value in list(shard.counters.items()):
+                counters[key] = counters.get(key, 0) + value
+            for key, (stamp, value) in list(shard.gauges.items()):
+                if key not in gauges or stamp > gauges[key][0]:
+                    gauges[key] = (stamp, value)
+            for key, (buckets, counts, total, count) in list(shard.histograms.items()):
+                merged = histograms.setdefault(key, [buckets, [0] * len(buckets), 0.0, 0])
+                merged[1] = [a + b for a, b in zip(merged[1], counts)]
+                merged[2] += total
+                merged[3] += count
+        return {
+            'counters': counters,
+            'gauges': {key: value for key, (_, value) in gauges.items()},
+            'histograms': histograms,
+        }
+
+    def prometheus_text(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        by_name = {}
+        for section in ('counters', 'gauges', 'histograms'):
+            for (name, labels), value in snapshot[section].items():
+                by_name.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name in sorted(by_name):
+            kind, help_text, _ = self._descriptions.get(name, ('untyped', name, None))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(by_name[name]):
+                if kind == 'histogram':
+                    buckets, counts, total, count = value
+                    cumulative = 0
+                    for bound, bucket_count in zip(buckets, counts):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{_labels(labels, le=f'{bound:g}')} {cumulative}")
+                    lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {count}")
+                    lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+                    lines.append(f"{name}_count{_labels(labels)} {count}")
+                else:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def json_snapshot(self):
+        """Return the metrics as a JSON-serializable dict"""
+        snapshot = self.snapshot()
+        result = {'timestamp': time.time(), 'counters': {}, 'gauges': {}, 'histograms': {}}
+        for section in ('counters', 'gauges'):
+            for (name, labels), value in snapshot[section].items():
+                result[section][name + _labels(labels)] = value
+        for (name, labels), (buckets, counts, total, count) in snapshot['histograms'].items():
+            result['histograms'][name + _labels(labels)] = {
+                'buckets': dict(zip((f"{bound:g}" for bound in buckets), counts)),
+                'sum': total,
+                'count': count,
+            }
+        return result
+
+
+def _number(value):
+    """Format a sample value without losing precision
+
+    ':g' would round to 6 significant digits, so large counters would only
+    move in steps and rate() would see them flat or jumping.
+    """
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def _escape(value):
+    """Escape a label value (label values come from command names)"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels, **extra):
+    """Format a label set as {a="1",b="2"}"""
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+METRICS = MetricsRegistry()
+METRICS.describe('openocd_commands_total', 'counter', 'OpenOCD commands sent, by command')
+METRICS.describe('openocd_command_errors_total', 'counter', 'OpenOCD commands without a usable response, by command')
+METRICS.describe('openocd_command_retries_total', 'counter', 'OpenOCD command retries, by command')
+METRICS.describe('openocd_command_seconds', 'histogram', 'OpenOCD command round-trip latency')
+METRICS.describe('flash_bytes_total', 'counter', 'Bytes programmed into flash')
+METRICS.describe('flash_seconds_total', 'counter', 'Time spent programming flash')
+METRICS.describe('flash_kbps', 'gauge', 'Throughput of the last flash programming operation in KB/s')
+METRICS.describe('step_seconds', 'histogram', 'Duration of config steps, by step type')
+METRICS.describe('step_resumes_total', 'counter', 'Config steps resumed after a transient failure')
+METRICS.describe('boards_total', 'counter', 'Boards processed, by result')
+
+
+class MetricsServer:
+    """Serve the registry as Prometheus text on http://127.0.0.1:<port>/metrics"""
+
+    def __init__(self, port, registry=METRICS, host="127.0.0.1"):
+        registry_ref = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry_ref.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Keep scrapes out of the console
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class JsonSnapshotWriter:
+    """Periodically write the registry to a JSON file (atomically replaced)"""
+
+    def __init__(self, path, interval=10, registry=METRICS):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="metrics-json", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        """Stop the writer and write a final snapshot"""
+        self._stop.set()
+        self.thread.join(timeout=5)
+        self.write()
+
+    def write(self):
+        """Write one snapshot"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.registry.json_snapshot(), f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
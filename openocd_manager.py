@@ -1,36 +1,100 @@
 """OpenOCD Manager - Handles OpenOCD process and communication"""
 
 import subprocess
-import socket
 import time
 import os
-from colors import error, success, info, warning
+import re
+import tempfile
+from collections import OrderedDict
+from output import out
+from devices import get_device, erase_granule, nonvolatile_regions
+from images import ImageError, image_type, load_image
+from manifest import FlashManifest, coalesce_segments
+from metrics import METRICS
+from rtt import RTTReader, RotatingFileSink
+from symbols import SymbolError
+from transport import TelnetTransport
+
+# Images larger than this are programmed in resumable chunks
+CHUNKED_PROGRAM_THRESHOLD = 256 * 1024
+CHUNK_SIZE = 128 * 1024
+
+# Upper bound of the non-volatile memory read cache
+READ_CACHE_BYTES = 256 * 1024
+
+DEFAULT_TELNET_PORT = 4444
+
+# Hosts on which the manager starts OpenOCD itself
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+
+class OpenOCDCommandError(RuntimeError):
+    """Raised when an OpenOCD command keeps failing after all retries"""
+
+    def __init__(self, message, response=None):
+        super().__init__(message)
+        self.response = response
+
+
+class OpenOCDConnectionError(RuntimeError):
+    """Raised when the telnet session to OpenOCD is lost"""
 
 
 class OpenOCDManager:
-    def __init__(self, interface_cfg=None, target_cfg=None, port=4444):
+    def __init__(self, interface_cfg=None, target_cfg=None, port=4444, serial=None,
+                 host="localhost", openocd_bin="openocd", transport=None):
         self.interface_cfg = interface_cfg
         self.target_cfg = target_cfg
         self.port = port
+        self.serial = serial
+        self.host = host
+        self.openocd_bin = openocd_bin
         self.process = None
-        self.socket = None
-        self.connected = False
-        self.buffer = b""
+        # Telnet to a real OpenOCD unless another transport (e.g. the emulator) is given
+        self.transport = transport or TelnetTransport(host, port)
+        self.adapter_speed = None
+        self.symbols = None
+        # Dry run: values shared with production (e.g. serial numbers) are only previewed
+        self.dry_run = False
+        # Unique ID of the fitted board, read once per board by read_chip_uid()
+        self.chip_uid = None
+        self.rtt_reader = None
+        self._rtt_port = None
+        self._dap_name = None
+        # (address, word count) -> mdw response, least recently used first
+        self._read_cache = OrderedDict()
+        self._read_cache_bytes = 0
+        self.read_cache_hits = 0
+        self.read_cache_misses = 0
+        # Running totals for per-step accounting (flash history)
+        self.bytes_programmed = 0
+        self.command_retries = 0
 
     def start_openocd(self):
         """Start OpenOCD process"""
         if self.process and self.process.poll() is None:
-            print(info("OpenOCD is already running"))
+            out.info("OpenOCD is already running")
+            return True
+        if not self.transport.requires_openocd:
+            return True
+        if self.host not in LOCAL_HOSTS:
+            out.info(f"Using OpenOCD already running on {self.host}:{self.port}")
             return True
 
-        cmd = ["openocd"]
+        cmd = [self.openocd_bin]
+        if self.port != DEFAULT_TELNET_PORT:
+            # Several OpenOCD instances on one host need distinct ports
+            cmd.extend(["-c", f"telnet_port {self.port}", "-c", "gdb_port disabled",
+                        "-c", "tcl_port disabled"])
         if self.interface_cfg:
             cmd.extend(["-f", self.interface_cfg])
+        if self.serial:
+            cmd.extend(["-c", f"adapter serial {self.serial}"])
         if self.target_cfg:
             cmd.extend(["-f", self.target_cfg])
 
         try:
-            print(info(f"Starting OpenOCD with command: {' '.join(cmd)}"))
+            out.info(f"Starting OpenOCD with command: {' '.join(cmd)}")
             self.process = subprocess.Popen(
                 cmd,
                 stdout=subprocess.PIPE,
@@ -41,80 +105,59 @@ class OpenOCDManager:
 
             if self.process.poll() is not None:
                 _, stderr = self.process.communicate()
-                print(error(f"OpenOCD failed to start: {stderr}"))
+                out.error(f"OpenOCD failed to start: {stderr}")
                 return False
 
-            print(success("OpenOCD started successfully"))
+            out.success("OpenOCD started successfully")
             return True
         except FileNotFoundError:
-            print(error("Error: openocd command not found. Please install OpenOCD."))
+            out.error(f"Error: {self.openocd_bin} command not found. Please install OpenOCD.")
             return False
         except Exception as e:
-            print(error(f"Error starting OpenOCD: {e}"))
+            out.error(f"Error starting OpenOCD: {e}")
             return False
 
+    @property
+    def connected(self):
+        return self.transport.connected
+
     def connect_telnet(self):
         """Connect to OpenOCD via telnet"""
         if self.connected:
-            print(info("Already connected to OpenOCD"))
+            out.info("Already connected to OpenOCD")
             return True
 
         try:
-            print(info(f"Connecting to OpenOCD on localhost:{self.port}..."))
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.settimeout(5)
-            self.socket.connect(("localhost", self.port))
-
-            # Read initial prompt
-            self._read_until(b">", timeout=2)
-            self.connected = True
-            print(success("Connected to OpenOCD successfully"))
+            if self.transport.requires_openocd:
+                out.info(f"Connecting to OpenOCD on {self.host}:{self.port}...")
+            else:
+                out.info("Connecting to emulated target...")
+            self.transport.connect()
+            out.success("Connected to OpenOCD successfully")
             return True
         except Exception as e:
-            print(error(f"Error connecting to OpenOCD: {e}"))
-            self.connected = False
-            if self.socket:
-                self.socket.close()
-                self.socket = None
+            out.error(f"Error connecting to OpenOCD: {e}")
             return False
 
-    def _read_until(self, delimiter, timeout=5):
-        """Read from socket until delimiter is found"""
-        self.socket.settimeout(timeout)
-        start_time = time.time()
-
-        while time.time() - start_time < timeout:
-            try:
-                data = self.socket.recv(4096)
-                if not data:
-                    break
-                self.buffer += data
-                if delimiter in self.buffer:
-                    result, self.buffer = self.buffer.split(delimiter, 1)
-                    return result + delimiter
-            except socket.timeout:
-                break
-            except Exception:
-                break
-
-        result = self.buffer
-        self.buffer = b""
-        return result
-
-    def _send_command_raw(self, command):
+    def _send_command_raw(self, command, timeout=5):
         """Send command to OpenOCD without retry logic"""
         if not self.connected:
-            print(error("Not connected to OpenOCD"))
+            out.error("Not connected to OpenOCD")
             return None
 
+        verb = command.split(' ', 1)[0]
+        METRICS.inc('openocd_commands_total', command=verb)
+        start = time.time()
         try:
-            self.socket.sendall(f"{command}\n".encode('ascii'))
-            response = self._read_until(b">", timeout=5).decode('ascii')
-            # Remove the prompt from response
-            response = response.rsplit('>', 1)[0].strip()
+            response = self.transport.send(command, timeout=timeout)
+            METRICS.observe('openocd_command_seconds', time.time() - start, command=verb)
+            if response is None:
+                out.error("Connection to OpenOCD lost")
+                METRICS.inc('openocd_command_errors_total', command=verb)
             return response
         except Exception as e:
-            print(error(f"Error sending command: {e}"))
+            out.error(f"Error sending command: {e}")
+            METRICS.inc('openocd_command_errors_total', command=verb)
             return None
 
     def _check_if_halted(self):
@@ -136,7 +179,7 @@ class OpenOCDManager:
     def _ensure_halted(self):
         """Ensure MCU is halted, halt it if not"""
         if not self._check_if_halted():
-            print(warning("MCU not halted, attempting to halt..."))
+            out.warning("MCU not halted, attempting to halt...")
             self._send_command_raw("halt")
             time.sleep(0.5)
 
@@ -162,31 +205,39 @@ class OpenOCDManager:
 
         return False
 
-    def send_command(self, command, max_retries=3, check_halt=True):
+    def send_command(self, command, max_retries=3, check_halt=True, timeout=5):
         """Send command to OpenOCD with retry logic
 
         Args:
             command: The OpenOCD command to send
             max_retries: Maximum number of retry attempts (default: 3)
             check_halt: Whether to check and ensure MCU is halted before retry (default: True)
+            timeout: Seconds to wait for the command to complete (default: 5)
 
         Raises:
-            RuntimeError: If command fails after all retry attempts
+            OpenOCDCommandError: If command fails after all retry attempts
+            OpenOCDConnectionError: If the connection to OpenOCD is lost
         """
         last_response = None
         for attempt in range(max_retries):
-            response = self._send_command_raw(command)
+            response = self._send_command_raw(command, timeout=timeout)
             last_response = response
 
+            # Retrying is pointless without a session
+            if response is None and not self.connected:
+                raise OpenOCDConnectionError(f"Connection to OpenOCD lost during '{command}'")
+
             # Check if command succeeded
             if not self._is_command_failed(response):
                 return response
 
             # Command failed
             if attempt < max_retries - 1:  # Don't retry on last attempt
-                print(warning(f"Command failed, retrying ({attempt + 2}/{max_retries})..."))
+                METRICS.inc('openocd_command_retries_total', command=command.split(' ', 1)[0])
+                self.command_retries += 1
+                out.warning(f"Command failed, retrying ({attempt + 2}/{max_retries})...")
                 if response:
-                    print(warning(f"OpenOCD response: {response}"))
+                    out.warning(f"OpenOCD response: {response}")
 
                 # Check if MCU is halted before retrying (except for halt/reset commands)
                 if check_halt and command not in ["halt", "reset halt", "reset run"]:
@@ -197,43 +248,46 @@ class OpenOCDManager:
                 error_msg = f"Command '{command}' failed after {max_retries} attempts"
                 if last_response:
                     error_msg += f"\nLast OpenOCD response: {last_response}"
-                print(error(error_msg))
-                raise RuntimeError(error_msg)
+                out.error(error_msg)
+                raise OpenOCDCommandError(error_msg, last_response)
 
         return response
 
     def halt(self):
         """Halt the MCU"""
-        print(info("Halting MCU..."))
+        out.info("Halting MCU...")
         response = self.send_command("halt", check_halt=False)
         if response:
-            print(success(response))
+            out.success(response)
         return response
 
     def reset_halt(self):
         """Reset and halt the MCU"""
-        print(info("Resetting and halting MCU..."))
+        out.info("Resetting and halting MCU...")
+        self.invalidate_read_cache()
         response = self.send_command("reset halt", check_halt=False)
         if response:
-            print(success(response))
+            out.success(response)
         return response
 
     def reset_run(self):
         """Reset and run the MCU"""
-        print(info("Resetting and running MCU..."))
+        out.info("Resetting and running MCU...")
+        self.invalidate_read_cache()
         response = self.send_command("reset run", check_halt=False)
         if response:
-            print(success(response))
+            out.success(response)
         return response
 
     def erase_flash(self):
         """Erase flash memory"""
-        print(warning("Erasing flash memory..."))
+        out.warning("Erasing flash memory...")
+        self.invalidate_read_cache()
         # Ensure MCU is halted before erasing
         self._ensure_halted()
         response = self.send_command("flash erase_sector 0 0 last")
         if response:
-            print(success(response))
+            out.success(response)
         return response
 
     def flash_firmware(self, firmware_path, address=0x08000000):
@@ -248,7 +302,7 @@ class OpenOCDManager:
         """
         if not os.path.exists(firmware_path):
             error_msg = f"Firmware file '{firmware_path}' not found"
-            print(error(f"Error: {error_msg}"))
+            out.error(f"Error: {error_msg}")
             raise FileNotFoundError(error_msg)
 
         # Build flash command
@@ -258,17 +312,249 @@ class OpenOCDManager:
                 addr_str = f"0x{address:08x}"
             else:
                 addr_str = address
-            print(info(f"Flashing firmware: {firmware_path} at address {addr_str}"))
+            out.info(f"Flashing firmware: {firmware_path} at address {addr_str}")
             flash_cmd = f"program {firmware_path} {addr_str}"
         else:
-            print(info(f"Flashing firmware: {firmware_path}"))
+            out.info(f"Flashing firmware: {firmware_path}")
             flash_cmd = f"program {firmware_path} 0x08000000"
 
         # Ensure MCU is halted before flashing
         self._ensure_halted()
+        self.invalidate_read_cache()
+        start = time.time()
         response = self.send_command(flash_cmd)
+        self._record_flash(os.path.getsize(firmware_path), time.time() - start)
         if response:
-            print(success(response))
+            out.success(response)
+        return response
+
+    def flash_firmware_resumable(self, firmware_path, address=None, progress=None):
+        """Flash firmware in chunks that can be resumed after a fault
+
+        Images larger than CHUNKED_PROGRAM_THRESHOLD are split into chunks on
+        erase sector boundaries: raw binaries from the given address, ELF and
+        Intel HEX images by load segment. Each chunk is programmed and
+        verified on its own. Like OpenOCD's program script, flashing starts
+        with 'reset init', so the target ends up in the same state either
+        way. Other images are flashed with flash_firmware().
+
+        Args:
+            firmware_path: Path to firmware file
+            address: Optional memory address to program at (default: flash base)
+            progress: Dict that receives 'next_chunk' after every verified chunk.
+                Passing the same dict again resumes from the first unconfirmed chunk.
+
+        Raises:
+            FileNotFoundError: If firmware file does not exist
+        """
+        device = get_device(self.target_cfg)
+        if (not device or not os.path.exists(firmware_path)
+                or os.path.getsize(firmware_path) <= CHUNKED_PROGRAM_THRESHOLD):
+            return self.flash_firmware(firmware_path, address)
+
+        try:
+            segments = self._flash_segments(device, firmware_path, address)
+        except (ImageError, ValueError) as e:
+            out.warning(f"{firmware_path} is not resumable ({e}), programming it in one step")
+            return self.flash_firmware(firmware_path, address)
+
+        chunks = [(chunk_start, data[chunk_start - start:chunk_end - start])
+                  for start, data in segments
+                  for chunk_start, chunk_end in self._plan_chunks(device, start, len(data))]
+        total = sum(len(data) for _, data in chunks)
+        if progress is None:
+            progress = {}
+        first_chunk = progress.get('next_chunk', 0)
+        if first_chunk:
+            out.info(f"Resuming {firmware_path} at chunk {first_chunk + 1}/{len(chunks)}")
+        else:
+            out.info(f"Flashing firmware: {firmware_path} ({total} bytes) in {len(chunks)} chunks")
+
+        # Same start as 'program', also after a resume
+        self.send_command("reset init")
+        self.invalidate_read_cache()
+        for index in range(first_chunk, len(chunks)):
+            chunk_start, data = chunks[index]
+            fd, chunk_path = tempfile.mkstemp(suffix=".bin")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                # Tcl expects forward slashes, also on Windows
+                tcl_path = chunk_path.replace(os.sep, '/')
+                start = time.time()
+                self.send_command(f"flash write_image erase {tcl_path} 0x{chunk_start:08x} bin", timeout=60)
+                self._record_flash(len(data), time.time() - start)
+                self.send_command(f"verify_image {tcl_path} 0x{chunk_start:08x} bin", timeout=60)
+            finally:
+                os.remove(chunk_path)
+
+            progress['next_chunk'] = index + 1
+            out.success(f"  Chunk {index + 1}/{len(chunks)} confirmed "
+                        f"(0x{chunk_start:08x}-0x{chunk_start + len(data):08x})")
+
+        response = f"Programmed and verified {total} bytes in {len(chunks)} chunks"
+        out.success(response)
+        return response
+
+    def _flash_segments(self, device, firmware_path, address):
+        """Load an image as flash segments that can be chunked independently
+
+        Returns:
+            list: (address, data) tuples, merged where they share an erase sector
+
+        Raises:
+            ValueError: If the image cannot be split safely
+        """
+        kind = image_type(firmware_path)
+        if kind == 'bin':
+            segments = load_image(firmware_path, device['flash_base'] if address is None else address)
+        elif address is not None:
+            # 'program' would treat the address as an offset for ELF/HEX
+            raise ValueError(f"{kind} images carry their own addresses")
+        else:
+            segments = sorted(load_image(firmware_path))
+
+        flash_end = device['flash_base'] + device['flash_size']
+        for (start, data), following in zip(segments, segments[1:] + [None]):
+            if not device['flash_base'] <= start <= flash_end - len(data):
+                raise ValueError(f"segment at 0x{start:08x} is outside the flash")
+            if following and start + len(data) > following[0]:
+                raise ValueError(f"segments at 0x{start:08x} and 0x{following[0]:08x} overlap")
+            if start % device['write_align']:
+                raise ValueError(f"segment at 0x{start:08x} is not aligned to the flash programming unit")
+        return coalesce_segments(segments, device)
+
+    def _plan_chunks(self, device, address, length):
+        """Split an address range into chunks that never share an erase sector
+
+        Returns:
+            list: (start, end) tuples, end exclusive
+        """
+        granule = erase_granule(device)
+        chunk_size = -(-CHUNK_SIZE // granule) * granule
+
+        chunks = []
+        start, end = address, address + length
+        while start < end:
+            boundary = device['flash_base'] + ((start - device['flash_base']) // chunk_size + 1) * chunk_size
+            chunks.append((start, min(boundary, end)))
+            start = min(boundary, end)
+        return chunks
+
+    def image_present(self, image_path, address):
+        """Check whether flash already holds a raw binary image
+
+        Only compares checksums, so a mismatch is reported quickly instead of
+        falling back to a full binary compare like verify_image does.
+
+        Returns:
+            bool: True if the flash content matches the image
+        """
+        tcl_path = image_path.replace(os.sep, '/')
+        response = self._send_command_raw(f"verify_image_checksum {tcl_path} 0x{address:08x} bin", timeout=60)
+        return not self._is_command_failed(response) and not self._is_mismatch(response)
+
+    def image_bytes_present(self, data, address):
+        """Check whether flash already holds the given bytes at an address"""
+        fd, path = tempfile.mkstemp(suffix=".bin")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            return self.image_present(path, address)
+        finally:
+            os.remove(path)
+
+    def program_bytes(self, data, address):
+        """Erase the covered sectors, program data at an address and verify it
+
+        Raises:
+            OpenOCDCommandError: If programming or verification fails
+        """
+        fd, path = tempfile.mkstemp(suffix=".bin")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            tcl_path = path.replace(os.sep, '/')
+            self._ensure_halted()
+            self.invalidate_read_cache()
+            start = time.time()
+            self.send_command(f"flash write_image erase {tcl_path} 0x{address:08x} bin", timeout=120)
+            self._record_flash(len(data), time.time() - start)
+            return self.send_command(f"verify_image {tcl_path} 0x{address:08x} bin", timeout=120)
+        finally:
+            os.remove(path)
+
+    def _record_flash(self, length, seconds):
+        """Count programmed bytes and record the throughput in the metrics"""
+        self.bytes_programmed += length
+        METRICS.inc('flash_bytes_total', length)
+        METRICS.inc('flash_seconds_total', seconds)
+        if seconds > 0:
+            METRICS.set('flash_kbps', length / 1024 / seconds)
+
+    def _is_mismatch(self, response):
+        """Check a verify response for a content mismatch"""
+        return "mismatch" in response.lower() or "differ" in response.lower()
+
+    def flash_manifest(self, images, force=False, progress=None):
+        """Flash a bundle of images with merged erase/program passes
+
+        The images are checked for overlaps and alignment, coalesced into the
+        fewest contiguous segments, programmed, and then all verified in one
+        pass. If the flash already holds the whole bundle it is skipped.
+
+        Args:
+            images: List of (filepath, address) tuples
+            force: Program even if the bundle is already present
+            progress: Dict that receives 'next_segment' after every programmed
+                segment. Passing the same dict again resumes programming.
+
+        Raises:
+            FileNotFoundError: If an image file does not exist
+            ManifestError: If the images cannot be flashed together
+        """
+        manifest = FlashManifest(images, get_device(self.target_cfg))
+        segments = manifest.segments()
+        fingerprint = manifest.fingerprint()
+        if progress is None:
+            progress = {}
+        out.info(f"Flashing manifest {fingerprint[:12]}: {len(images)} images in {len(segments)} segment(s)")
+
+        self._ensure_halted()
+        paths = []
+        try:
+            for address, data in segments:
+                fd, path = tempfile.mkstemp(suffix=".bin")
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                paths.append(path)
+
+            # The bundle is one unit: skip only if every segment matches
+            if not force and not progress and all(self.image_present(path, address)
+                                                  for path, (address, _) in zip(paths, segments)):
+                response = f"Manifest {fingerprint[:12]} already present, skipping"
+                out.success(response)
+                return response
+
+            self.invalidate_read_cache()
+            for index in range(progress.get('next_segment', 0), len(segments)):
+                address, data = segments[index]
+                out.info(f"  Programming segment {index + 1}/{len(segments)}: "
+                         f"0x{address:08x}-0x{address + len(data):08x}")
+                start = time.time()
+                self.send_command(f"flash write_image erase {paths[index].replace(os.sep, '/')} "
+                                  f"0x{address:08x} bin", timeout=120)
+                self._record_flash(len(data), time.time() - start)
+                progress['next_segment'] = index + 1
+
+            for path, (address, data) in zip(paths, segments):
+                self.send_command(f"verify_image {path.replace(os.sep, '/')} 0x{address:08x} bin", timeout=120)
+        finally:
+            for path in paths:
+                os.remove(path)
+
+        response = f"Manifest {fingerprint[:12]} programmed and verified ({len(images)} images)"
+        out.success(response)
         return response
 
     def verify_firmware(self, firmware_path, address=0x08000000):
@@ -283,7 +569,7 @@ class OpenOCDManager:
         """
         if not os.path.exists(firmware_path):
             error_msg = f"Firmware file '{firmware_path}' not found"
-            print(error(f"Error: {error_msg}"))
+            out.error(f"Error: {error_msg}")
             raise FileNotFoundError(error_msg)
 
         # Build verify command
@@ -293,75 +579,327 @@ class OpenOCDManager:
                 addr_str = f"0x{address:08x}"
             else:
                 addr_str = address
-            print(info(f"Verifying firmware: {firmware_path} at address {addr_str}"))
+            out.info(f"Verifying firmware: {firmware_path} at address {addr_str}")
             verify_cmd = f"verify_image {firmware_path} {addr_str}"
         else:
-            print(info(f"Verifying firmware: {firmware_path}"))
+            out.info(f"Verifying firmware: {firmware_path}")
             verify_cmd = f"verify_image {firmware_path}"
 
         # Ensure MCU is halted before verifying
         self._ensure_halted()
         response = self.send_command(verify_cmd)
         if response:
-            print(success(response))
+            out.success(response)
         return response
 
     def read_memory(self, address, count=1):
-        """Read memory at address"""
-        print(info(f"Reading memory at 0x{address:08x} (count: {count})..."))
+        """Read memory at address
+
+        Reads of non-volatile memory (flash, OTP, option bytes) are served
+        from a cache that is invalidated by every erase, program, write and
+        reset done through this manager.
+        """
+        key = (address, count)
+        cacheable = self._is_nonvolatile(address, count * 4)
+        if cacheable and key in self._read_cache:
+            self._read_cache.move_to_end(key)
+            self.read_cache_hits += 1
+            response = self._read_cache[key]
+            out.info(f"Reading memory at 0x{address:08x} (count: {count}, cached)...")
+            out.info(response)
+            return response
+
+        out.info(f"Reading memory at 0x{address:08x} (count: {count})...")
         response = self.send_command(f"mdw 0x{address:08x} {count}")
         if response:
-            print(info(response))
+            out.info(response)
+            if cacheable:
+                self.read_cache_misses += 1
+                self._cache_read(key, response)
         return response
 
+    def _is_nonvolatile(self, address, length):
+        """Check whether a range lies inside one non-volatile region"""
+        device = get_device(self.target_cfg)
+        if not device:
+            return False
+        return any(start <= address and address + length <= end
+                   for start, end in nonvolatile_regions(device))
+
+    def _cache_read(self, key, response):
+        """Store a read response, evicting least recently used entries"""
+        self._read_cache[key] = response
+        self._read_cache_bytes += key[1] * 4
+        while self._read_cache_bytes > READ_CACHE_BYTES:
+            (_, count), _ = self._read_cache.popitem(last=False)
+            self._read_cache_bytes -= count * 4
+
+    def invalidate_read_cache(self, start=None, end=None):
+        """Drop cached reads overlapping [start, end), or all reads"""
+        for key in list(self._read_cache):
+            address, count = key
+            if start is None or (address < end and start < address + count * 4):
+                del self._read_cache[key]
+                self._read_cache_bytes -= count * 4
+
     def write_memory(self, address, value):
         """Write value to memory address"""
-        print(info(f"Writing 0x{value:08x} to address 0x{address:08x}..."))
+        out.info(f"Writing 0x{value:08x} to address 0x{address:08x}...")
+        self.invalidate_read_cache(address, address + 4)
         # Ensure MCU is halted before writing to memory
         self._ensure_halted()
         response = self.send_command(f"mww 0x{address:08x} 0x{value:08x}")
         if response:
-            print(success(response))
+            out.success(response)
         return response
 
+    def read_words(self, address, count=1):
+        """Read memory words without printing or retrying
+
+        Args:
+            address: Start address
+            count: Number of 32-bit words to read
+
+        Returns:
+            list: Word values, or None if the read failed
+        """
+        response = self._send_command_raw(f"mdw 0x{address:08x} {count}")
+        if self._is_command_failed(response):
+            return None
+
+        words = []
+        for line in response.splitlines():
+            match = re.match(r"\s*0x[0-9a-fA-F]+:\s*(.*)", line)
+            if match:
+                words.extend(int(word, 16) for word in match.group(1).split())
+        return words if len(words) == count else None
+
+    def read_idcode(self):
+        """Read the target IDCODE as a cheap presence check
+
+        Uses the DAP DPIDR register when the adapter exposes a DAP, otherwise
+        the DBGMCU_IDCODE register of the target family.
+
+        Returns:
+            int: IDCODE value, or None if no target responds
+        """
+        if self._dap_name is None:
+            response = self._send_command_raw("dap names")
+            names = response.split() if response and not self._is_command_failed(response) else []
+            self._dap_name = names[0] if names else ""
+
+        if self._dap_name:
+            response = self._send_command_raw(f"{self._dap_name} dpreg 0")
+            if self._is_command_failed(response):
+                return None
+            match = re.search(r"0x([0-9a-fA-F]+)", response)
+            idcode = int(match.group(1), 16) if match else None
+        else:
+            device = get_device(self.target_cfg)
+            if not device:
+                return None
+            words = self.read_words(device['idcode_address'])
+            idcode = words[0] if words else None
+
+        # A floating SWDIO line reads back as all zeros or all ones
+        if idcode in (0, 0xFFFFFFFF):
+            return None
+        return idcode
+
+    def read_chip_uid(self):
+        """Read the unique device ID of the fitted chip and keep it in chip_uid
+
+        Returns:
+            str: UID as hex, or None if unknown or unreadable
+        """
+        device = get_device(self.target_cfg)
+        words = self.read_words(device['uid_address'], 3) if device and device['uid_address'] else None
+        self.chip_uid = "".join(f"{word:08x}" for word in words) if words else None
+        return self.chip_uid
+
     def get_target_info(self):
         """Get target information"""
-        print(info("Getting target information..."))
+        out.info("Getting target information...")
         response = self.send_command("targets")
         if response:
-            print(info(response))
+            out.info(response)
         return response
 
+    def set_adapter_speed(self, speed_khz):
+        """Set the adapter (SWD/JTAG) clock
+
+        Args:
+            speed_khz: Requested clock in kHz
+
+        Returns:
+            int: Clock actually selected by the adapter in kHz, or None if unknown
+        """
+        response = self.send_command(f"adapter speed {speed_khz}", check_halt=False)
+        actual = self._parse_adapter_speed(response)
+        # Remembered so a restarted OpenOCD gets the same clock
+        self.adapter_speed = actual or speed_khz
+        return actual
+
+    def get_adapter_speed(self):
+        """Get the current adapter clock in kHz, or None if unknown"""
+        return self._parse_adapter_speed(self._send_command_raw("adapter speed"))
+
+    def _parse_adapter_speed(self, response):
+        """Extract the clock from an 'adapter speed: 4000 kHz' response"""
+        if not response:
+            return None
+        match = re.search(r"(\d+)\s*khz", response.lower())
+        return int(match.group(1)) if match else None
+
+    def get_probe_serial(self):
+        """Get the serial number of the debug probe
+
+        'adapter serial' only selects a probe while OpenOCD reads its config;
+        it cannot be queried at runtime, so the serial is only known when it
+        was given (e.g. with --probe-serial).
+
+        Returns:
+            str: Probe serial, or None if unknown
+        """
+        return self.serial
+
+    def rtt_start(self, log_path=None, port=9090, channel=0, callback=None, timeout=2):
+        """Start RTT and stream one channel to a rotating log file or a callback
+
+        The control block is located from the _SEGGER_RTT symbol when an ELF
+        file is loaded, otherwise the target RAM is searched for it.
+
+        Args:
+            log_path: File that receives the channel data (rotated when large)
+            port: TCP port for the OpenOCD RTT server
+            channel: RTT up-channel to stream
+            callback: Called with each block of data instead of writing a file
+            timeout: Seconds to wait for the firmware to set up the control block
+
+        Raises:
+            RuntimeError: If the control block is not found or the server fails
+        """
+        if self.rtt_reader:
+            self.rtt_stop()
+
+        address, size = None, None
+        if self.symbols:
+            try:
+                address, size = self.symbols.lookup("_SEGGER_RTT")
+            except (SymbolError, FileNotFoundError):
+                pass
+        if address is None:
+            device = get_device(self.target_cfg)
+            if not device:
+                raise RuntimeError(f"Cannot locate the RTT control block on {self.target_cfg} without an ELF file")
+            address, size = device['ram_start'], device['ram_size']
+        # The search range must at least cover the control block ID
+        size = max(size or 0, 16)
+
+        out.info(f"Starting RTT (control block search at 0x{address:08x}, {size} bytes)...")
+        self.send_command(f'rtt setup 0x{address:08x} {size} "SEGGER RTT"', check_halt=False)
+
+        # The firmware may still be initializing the control block after reset
+        deadline = time.time() + timeout
+        while True:
+            response = self.send_command("rtt start", check_halt=False)
+            if response is None or "no control block" not in response.lower():
+                break
+            self._send_command_raw("rtt stop")
+            if time.time() > deadline:
+                raise RuntimeError("RTT control block not found")
+            time.sleep(0.2)
+
+        self.send_command(f"rtt server start {port} {channel}", check_halt=False)
+
+        sink = callback or RotatingFileSink(log_path or "rtt.log")
+        self.rtt_reader = RTTReader(port, sink, host=self.host)
+        self._rtt_port = port
+        try:
+            self.rtt_reader.start()
+        except OSError as e:
+            self.rtt_reader = None
+            raise RuntimeError(f"Cannot connect to the RTT server on port {port}: {e}")
+        out.success(f"Streaming RTT channel {channel} to {log_path or 'callback'}")
+
+    def rtt_stop(self):
+        """Stop RTT streaming and report the transfer counters
+
+        Returns:
+            dict: Reader statistics, or None if RTT was not running
+        """
+        if not self.rtt_reader:
+            return None
+
+        self.rtt_reader.stop()
+        stats = self.rtt_reader.stats()
+        self.rtt_reader = None
+        if self.connected:
+            self._send_command_raw(f"rtt server stop {self._rtt_port}")
+            self._send_command_raw("rtt stop")
+
+        message = (f"RTT stopped: {stats['bytes_received']} bytes received, "
+                   f"{stats['dropped_bytes']} dropped, {stats['bytes_per_second'] / 1024:.1f} KB/s")
+        if stats['dropped_bytes']:
+            out.warning(message)
+        else:
+            out.success(message)
+        return stats
+
     def custom_command(self, command):
         """Send custom OpenOCD command"""
-        print(info(f"Sending command: {command}"))
+        out.info(f"Sending command: {command}")
+        # Custom commands may change memory in any way
+        self.invalidate_read_cache()
         response = self.send_command(command)
         if response:
-            print(info(response))
+            out.info(response)
         return response
 
     def disconnect(self):
         """Disconnect socket connection"""
-        if self.socket:
+        if self.connected:
+            out.success("Disconnected from OpenOCD")
+        self.transport.close()
+
+    def reconnect(self):
+        """Re-establish the OpenOCD session, restarting OpenOCD if it died
+
+        Returns:
+            bool: True if connected again
+        """
+        self.disconnect()
+        self.invalidate_read_cache()
+
+        restarted = False
+        if (self.transport.requires_openocd and self.host in LOCAL_HOSTS
+                and (not self.process or self.process.poll() is not None)):
+            out.warning("OpenOCD is not running, restarting...")
+            if not self.start_openocd():
+                return False
+            restarted = True
+
+        if not self.connect_telnet():
+            return False
+
+        if restarted and self.adapter_speed:
             try:
-                self.socket.close()
-                print(success("Disconnected from OpenOCD"))
-            except:
-                pass
-            self.connected = False
-            self.socket = None
-            self.buffer = b""
+                self.set_adapter_speed(self.adapter_speed)
+            except RuntimeError as e:
+                out.warning(f"Could not restore adapter speed: {e}")
+        return True
 
     def stop_openocd(self):
         """Stop OpenOCD process"""
+        self.rtt_stop()
         self.disconnect()
 
         if self.process and self.process.poll() is None:
-            print(info("Stopping OpenOCD..."))
+            out.info("Stopping OpenOCD...")
             self.process.terminate()
             try:
                 self.process.wait(timeout=5)
             except subprocess.TimeoutExpired:
                 self.process.kill()
-            print(success("OpenOCD stopped"))
+            out.success("OpenOCD stopped")
         self.process = None
@@ -0,0 +1,128 @@
+"""Output - Leveled console messages and machine-readable run results"""
+
+import json
+import sys
+import threading
+import time
+from colors import success, error, warning, info, header, disable_colors
+
+# Message levels
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+
+class Output:
+    """Console writer shared by all modules
+
+    Messages below the current level are dropped before any coloring or I/O.
+    In JSON mode the console only gets errors (on stderr) and every config run
+    is written to stdout as a single JSON document.
+    """
+
+    def __init__(self):
+        self.level = INFO
+        self.json_mode = False
+        self.stream = None
+        self._lock = threading.Lock()
+        self._report = None
+
+    def configure(self, quiet=False, json_mode=False):
+        """Apply the --quiet and --json options
+
+        Args:
+            quiet: Print errors only
+            json_mode: Emit JSON result documents on stdout, errors on stderr
+        """
+        if quiet or json_mode:
+            self.level = ERROR
+            disable_colors()
+        if json_mode:
+            self.json_mode = True
+            self.stream = sys.stderr
+
+    def _write(self, level, text, style=None):
+        if level < self.level:
+            return
+        if style:
+            text = style(text)
+        with self._lock:
+            stream = self.stream or sys.stdout
+            stream.write(f"{text}\n")
+            stream.flush()
+
+    def debug(self, text):
+        self._write(DEBUG, text)
+
+    def info(self, text):
+        self._write(INFO, text, info)
+
+    def success(self, text):
+        self._write(INFO, text, success)
+
+    def header(self, text):
+        self._write(INFO, text, header)
+
+    def plain(self, text=""):
+        self._write(INFO, text)
+
+    def warning(self, text):
+        self._write(WARNING, text, warning)
+
+    def error(self, text):
+        self._write(ERROR, text, error)
+
+    def _current_report(self):
+        if self._report is None:
+            self._report = {'started': time.time(), 'steps': [], 'errors': []}
+        return self._report
+
+    def begin_run(self, **fields):
+        """Start the result document of a config run (JSON mode only)
+
+        Args:
+            **fields: Run attributes (target, probe serial, ...)
+        """
+        if not self.json_mode:
+            return
+        report = self._current_report()
+        report['started'] = time.time()
+        report.update(fields)
+
+    def step(self, index, cmd_type, command, seconds, passed, response=None, error_text=None):
+        """Record one executed config command (JSON mode only)"""
+        if not self.json_mode:
+            return
+        record = {
+            'index': index,
+            'type': cmd_type,
+            'command': command,
+            'seconds': round(seconds, 4),
+            'passed': passed,
+        }
+        if response is not None:
+            record['response'] = response
+        if error_text is not None:
+            record['error'] = error_text
+        self._current_report()['steps'].append(record)
+
+    def add_error(self, text):
+        """Record an error of the current run (JSON mode only)"""
+        if self.json_mode:
+            self._current_report()['errors'].append(text)
+
+    def end_run(self, exit_code):
+        """Write the result document of the current run (JSON mode only)"""
+        if not self.json_mode or self._report is None:
+            return
+        report, self._report = self._report, None
+        report['result'] = 'passed' if exit_code == 0 else 'failed'
+        report['exit_code'] = exit_code
+        report['duration'] = round(time.time() - report['started'], 4)
+        with self._lock:
+            sys.stdout.write(json.dumps(report, default=str) + "\n")
+            sys.stdout.flush()
+
+
+out = Output()
@@ -0,0 +1,57 @@
+"""Recovery - Failure classification and checkpoints for resumable runs"""
+
+import socket
+from openocd_manager import OpenOCDCommandError, OpenOCDConnectionError
+
+TRANSIENT = "transient"
+FATAL = "fatal"
+
+# OpenOCD responses caused by a flaky link rather than by the target or image
+TRANSIENT_PATTERNS = [
+    "timed out",
+    "timeout",
+    "communication failure",
+    "jtag status contains invalid mode",
+    "target not examined",
+    "no device found",
+    "open failed",
+    "connection",
+]
+
+
+def classify_failure(exc):
+    """Classify an exception raised while executing a config command
+
+    Transient failures (lost session, link errors) are worth a reconnect and
+    a resume. Everything else, such as missing files, invalid parameters or
+    verify mismatches, is fatal.
+
+    Args:
+        exc: The exception raised by the command
+
+    Returns:
+        str: TRANSIENT or FATAL
+    """
+    if isinstance(exc, (OpenOCDConnectionError, ConnectionError, socket.timeout)):
+        return TRANSIENT
+
+    if isinstance(exc, OpenOCDCommandError) and exc.response:
+        response_lower = exc.response.lower()
+        for pattern in TRANSIENT_PATTERNS:
+            if pattern in response_lower:
+                return TRANSIENT
+
+    return FATAL
+
+
+class RunCheckpoint:
+    """Progress of a config run, kept across reconnects"""
+
+    def __init__(self):
+        self.step = 0
+        self.resumes = 0
+        self._chunk_progress = {}
+
+    def chunk_progress(self, step):
+        """Return the chunk progress dict of a step, shared across resumes"""
+        return self._chunk_progress.setdefault(step, {})
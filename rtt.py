@@ -0,0 +1,163 @@
+"""RTT Reader - Streams SEGGER RTT channel data from the OpenOCD RTT server"""
+
+import os
+import socket
+import threading
+import time
+from collections import deque
+
+# Bytes buffered between the socket and the sink before data is dropped
+DEFAULT_MAX_BUFFER = 1024 * 1024
+
+
+class RotatingFileSink:
+    """Append data to a log file, rotating it to .1, .2, ... when it gets large"""
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backups=5):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'ab')
+
+    def __call__(self, data):
+        if self._file.tell() + len(data) > self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._file.flush()
+
+    def _rotate(self):
+        """Shift existing backups and start a new log file"""
+        self._file.close()
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        self._file = open(self.path, 'wb')
+
+    def close(self):
+        self._file.close()
+
+
+class RTTReader:
+    """Background reader for one RTT channel served by OpenOCD over TCP
+
+    A reader thread drains the socket into a bounded buffer and a writer
+    thread hands the data to the sink, so a slow sink never stalls the
+    socket. When the buffer is full, new data is dropped and counted.
+    """
+
+    def __init__(self, port, sink, host="localhost", max_buffer=DEFAULT_MAX_BUFFER):
+        """
+        Args:
+            port: TCP port of the OpenOCD RTT server
+            sink: Callable receiving bytes (e.g. a RotatingFileSink)
+            host: Host running OpenOCD
+            max_buffer: Maximum number of buffered bytes
+        """
+        self.port = port
+        self.sink = sink
+        self.host = host
+        self.max_buffer = max_buffer
+        self.bytes_received = 0
+        self.bytes_written = 0
+        self.dropped_bytes = 0
+        self.start_time = None
+        self.stop_time = None
+        self._buffer = deque()
+        self._buffered = 0
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._socket = None
+        self._threads = []
+
+    def start(self, timeout=5):
+        """Connect to the RTT server and start the background threads
+
+        Raises:
+            OSError: If the RTT server cannot be reached within the timeout
+        """
+        deadline = time.time() + timeout
+        while True:
+            try:
+                self._socket = socket.create_connection((self.host, self.port), timeout=1)
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.1)
+
+        # Short timeout so the reader notices stop() quickly
+        self._socket.settimeout(0.2)
+        self.start_time = time.time()
+        self._threads = [threading.Thread(target=self._read_loop, name="rtt-reader", daemon=True),
+                         threading.Thread(target=self._write_loop, name="rtt-writer", daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """Stop reading, flush the buffered data and close the connection"""
+        self._stopping = True
+        with self._condition:
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        if self._socket:
+            self._socket.close()
+            self._socket = None
+        if hasattr(self.sink, 'close'):
+            self.sink.close()
+        self.stop_time = time.time()
+
+    def _read_loop(self):
+        """Receive channel data into the bounded buffer"""
+        while not self._stopping:
+            try:
+                data = self._socket.recv(65536)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            if not data:
+                break
+
+            self.bytes_received += len(data)
+            with self._condition:
+                if self._buffered + len(data) > self.max_buffer:
+                    self.dropped_bytes += len(data)
+                    continue
+                self._buffer.append(data)
+                self._buffered += len(data)
+                self._condition.notify()
+
+    def _write_loop(self):
+        """Hand buffered data to the sink until stopped and drained"""
+        while True:
+            with self._condition:
+                while not self._buffer and not self._stopping:
+                    self._condition.wait()
+                if not self._buffer:
+                    return
+                data = b"".join(self._buffer)
+                self._buffer.clear()
+                self._buffered = 0
+            self.sink(data)
+            self.bytes_written += len(data)
+
+    def stats(self):
+        """Return received, written and dropped byte counts and the throughput
+
+        Returns:
+            dict: Counters and 'bytes_per_second'
+        """
+        end = self.stop_time or time.time()
+        elapsed = end - self.start_time if self.start_time else 0
+        return {
+            'bytes_received': self.bytes_received,
+            'bytes_written': self.bytes_written,
+            'dropped_bytes': self.dropped_bytes,
+            'bytes_per_second': self.bytes_received / elapsed if elapsed > 0 else 0.0,
+        }
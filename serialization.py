@@ -0,0 +1,416 @@
+"""Serialization - Per-unit serial numbers and keys patched into a shared image"""
+
+import csv
+import os
+import re
+import socket
+import struct
+import time
+from output import out
+from devices import get_device, sector_bounds
+
+# Integer formats: name -> struct format
+INT_FORMATS = {
+    'u8': '<B',
+    'u16le': '<H',
+    'u16be': '>H',
+    'u32le': '<I',
+    'u32be': '>I',
+    'u64le': '<Q',
+    'u64be': '>Q',
+}
+
+# Byte string formats with their width, e.g. ascii16, hex12, raw4
+BYTES_FORMAT = re.compile(r"(ascii|hex|raw)([1-9][0-9]*)")
+
+# Seconds after which a leftover lock file from a crashed station is broken
+STALE_LOCK_SECONDS = 30
+
+# Base images shared between units: path -> (mtime, size, bytes)
+_base_images = {}
+
+
+class SerializationError(ValueError):
+    """Raised when a unit cannot be serialized"""
+
+
+class FileLock:
+    """Cross-process lock based on exclusive creation of a lock file
+
+    Works on every platform and on network shares used by several stations.
+    """
+
+    def __init__(self, path, timeout=10):
+        self.path = f"{path}.lock"
+        self.timeout = timeout
+
+    def __enter__(self):
+        deadline = time.time() + self.timeout
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, f"{socket.gethostname()}:{os.getpid()}".encode('ascii'))
+                os.close(fd)
+                return self
+            except FileExistsError:
+                try:
+                    stat = os.stat(self.path)
+                except OSError:
+                    continue
+                if time.time() - stat.st_mtime > STALE_LOCK_SECONDS:
+                    self._break_stale(stat)
+                    continue
+                if time.time() > deadline:
+                    raise SerializationError(f"Timed out waiting for lock {self.path}")
+                time.sleep(0.05)
+
+    def _break_stale(self, stale):
+        """Remove a stale lock file unless another waiter already replaced it
+
+        Waiters that saw the same stale lock take turns through a second lock
+        file, and the lock is only removed while it is still the file that
+        was found stale; a plain remove could delete a fresh lock taken in
+        between and let two stations in.
+        """
+        breaker = f"{self.path}.break"
+        try:
+            fd = os.open(breaker, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            # Another waiter is breaking it; only a crashed breaker leaves this behind
+            try:
+                if time.time() - os.path.getmtime(breaker) > STALE_LOCK_SECONDS:
+                    os.remove(breaker)
+            except OSError:
+                pass
+            time.sleep(0.05)
+            return
+        os.close(fd)
+        try:
+            current = os.stat(self.path)
+            same = (current.st_ino, current.st_mtime, current.st_size)
+            if same == (stale.st_ino, stale.st_mtime, stale.st_size):
+                os.remove(self.path)
+        except OSError:
+            pass
+        finally:
+            os.remove(breaker)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        os.remove(self.path)
+
+
+def _append_log(log_path, *fields):
+    """Append an assignment record (caller must hold the lock)"""
+    with open(log_path, 'a', newline='') as f:
+        csv.writer(f).writerow([time.strftime("%Y-%m-%d %H:%M:%S"),
+                                f"{socket.gethostname()}:{os.getpid()}", *fields])
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class CounterSource:
+    """Monotonic counter kept in a state file shared by all stations"""
+
+    def __init__(self, state_path, start=1):
+        self.state_path = state_path
+        self.start = start
+
+    def allocate(self, manager, check=None):
+        """Reserve the next counter value
+
+        Args:
+            manager: Connected OpenOCDManager instance
+            check: Optional callable that gets the values and raises to
+                reject them; a rejected value is not reserved
+
+        Returns:
+            list: [value]
+        """
+        with FileLock(self.state_path):
+            value = self.start
+            if os.path.exists(self.state_path):
+                with open(self.state_path, 'r') as f:
+                    value = int(f.read().strip())
+            if check:
+                check([value])
+
+            # Persist the next value before handing this one out, so a crash
+            # can only skip a number, never reuse it
+            tmp_path = f"{self.state_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(f"{value + 1}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.state_path)
+            _append_log(f"{self.state_path}.log", value)
+        return [value]
+
+    def preview(self, manager, check=None):
+        """Return the value allocate() would reserve, without reserving it"""
+        value = self.start
+        if os.path.exists(self.state_path):
+            with open(self.state_path, 'r') as f:
+                value = int(f.read().strip())
+        if check:
+            check([value])
+        return [value]
+
+
+class CsvSource:
+    """Rows of a CSV file (with a header row), each handed out once"""
+
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+        self.log_path = f"{csv_path}.log"
+
+    def allocate(self, manager, check=None):
+        """Reserve the first row not assigned by any station
+
+        Args:
+            manager: Connected OpenOCDManager instance
+            check: Optional callable that gets the values and raises to
+                reject them; a rejected row is not reserved
+
+        Returns:
+            list: Field values of the row
+        """
+        with FileLock(self.csv_path):
+            index, row = self._next_row()
+            if check:
+                check(row)
+            _append_log(self.log_path, index, *row)
+            return row
+
+    def preview(self, manager, check=None):
+        """Return the row allocate() would reserve, without reserving it"""
+        _, row = self._next_row()
+        if check:
+            check(row)
+        return row
+
+    def _next_row(self):
+        """Return (index, row) of the first row not in the assignment log"""
+        used = set()
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'r', newline='') as f:
+                used = {int(record[2]) for record in csv.reader(f) if len(record) > 2}
+
+        with open(self.csv_path, 'r', newline='') as f:
+            rows = list(csv.reader(f))[1:]
+        for index, row in enumerate(rows):
+            if index not in used and row:
+                return index, row
+        raise SerializationError(f"All rows of {self.csv_path} are already assigned")
+
+
+class UidSource:
+    """Unique device ID read from the target"""
+
+    def allocate(self, manager, check=None):
+        """Read the 96-bit UID of the connected chip
+
+        Args:
+            manager: Connected OpenOCDManager instance
+            check: Optional callable that gets the values and raises to reject them
+
+        Returns:
+            list: [uid bytes]
+        """
+        device = get_device(manager.target_cfg)
+        if not device:
+            raise SerializationError(f"No UID address known for {manager.target_cfg}")
+        words = manager.read_words(device['uid_address'], 3)
+        if not words:
+            raise SerializationError("Could not read the device UID")
+        values = [struct.pack('<3I', *words)]
+        if check:
+            check(values)
+        return values
+
+    # Reading the UID reserves nothing
+    preview = allocate
+
+
+def make_source(spec):
+    """Create a value source from 'counter:<file>[:<start>]', 'csv:<file>' or 'uid'"""
+    kind, _, arg = spec.partition(':')
+    if kind == 'counter' and arg:
+        path, _, start = arg.partition(':')
+        return CounterSource(path, int(start, 0) if start else 1)
+    if kind == 'csv' and arg:
+        return CsvSource(arg)
+    if kind == 'uid' and not arg:
+        return UidSource()
+    raise SerializationError(f"Invalid serialization source: {spec}")
+
+
+def check_formats(formats):
+    """Validate format names before any value is allocated
+
+    Raises:
+        SerializationError: If a format name is unknown
+    """
+    for fmt in formats:
+        if fmt not in INT_FORMATS and not BYTES_FORMAT.fullmatch(fmt):
+            raise SerializationError(f"Unknown serialization format: {fmt}")
+
+
+def render(values, formats):
+    """Pack source values into the patch bytes
+
+    Args:
+        values: Values from a source (ints, strings or bytes)
+        formats: Format names, one per value: u8, u16le/be, u32le/be,
+            u64le/be, ascii<N> (NUL padded), hex<N> or raw<N> (N bytes)
+
+    Returns:
+        bytes: Fields packed back to back
+    """
+    if len(values) != len(formats):
+        raise SerializationError(f"Source provides {len(values)} value(s) but {len(formats)} format(s) given")
+
+    patch = b""
+    for value, fmt in zip(values, formats):
+        try:
+            if fmt in INT_FORMATS:
+                number = value if isinstance(value, int) else int(value, 0)
+                patch += struct.pack(INT_FORMATS[fmt], number)
+            elif fmt.startswith('ascii'):
+                text = value if isinstance(value, str) else str(value)
+                width = int(fmt[5:])
+                if len(text) > width:
+                    raise SerializationError(f"'{text}' does not fit in {fmt}")
+                patch += text.encode('ascii').ljust(width, b"\0")
+            elif fmt.startswith('hex') or fmt.startswith('raw'):
+                if isinstance(value, int):
+                    # bytes(int) would silently yield that many zero bytes
+                    raise SerializationError(f"{fmt} needs bytes or a hex string, use an integer "
+                                             f"format such as u32le for {value}")
+                data = bytes.fromhex(value) if isinstance(value, str) else bytes(value)
+                if len(data) != int(fmt[3:]):
+                    raise SerializationError(f"Value is {len(data)} bytes, {fmt} expects {fmt[3:]}")
+                patch += data
+            else:
+                raise SerializationError(f"Unknown serialization format: {fmt}")
+        except SerializationError:
+            raise
+        except (struct.error, ValueError) as e:
+            raise SerializationError(f"Cannot format {value!r} as {fmt}: {e}")
+    return patch
+
+
+class PatchedImage:
+    """Copy-on-write view of a base image with per-unit patches on top
+
+    The base is loaded once and shared between units; only the patch bytes
+    are stored per unit.
+    """
+
+    def __init__(self, base_path, base_address):
+        self.base = self._load_base(base_path)
+        self.base_address = base_address
+        self.patches = []
+
+    @staticmethod
+    def _load_base(path):
+        """Return the image bytes, re-reading the file only if it changed"""
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Firmware file '{path}' not found")
+        stat = os.stat(path)
+        cached = _base_images.get(path)
+        if not cached or cached[:2] != (stat.st_mtime, stat.st_size):
+            with open(path, 'rb') as f:
+                cached = (stat.st_mtime, stat.st_size, f.read())
+            _base_images[path] = cached
+        return memoryview(cached[2])
+
+    @property
+    def end(self):
+        return self.base_address + len(self.base)
+
+    def patch(self, address, data):
+        """Overlay data at an absolute address inside the image"""
+        if address < self.base_address or address + len(data) > self.end:
+            raise SerializationError(f"Patch at 0x{address:08x} is outside the image "
+                                     f"(0x{self.base_address:08x}-0x{self.end:08x})")
+        self.patches.append((address, bytes(data)))
+
+    def read(self, start, end):
+        """Return the bytes of [start, end) with patches applied"""
+        data = bytearray(self.base[start - self.base_address:end - self.base_address])
+        for address, patch in self.patches:
+            lo, hi = max(start, address), min(end, address + len(patch))
+            if lo < hi:
+                data[lo - start:hi - start] = patch[lo - address:hi - address]
+        return bytes(data)
+
+
+class Serializer:
+    """Serialize one unit as described by a 'serialize' config command"""
+
+    def __init__(self, cmd, reserve=True):
+        """
+        Args:
+            cmd: 'serialize' command dictionary
+            reserve: False to only preview the next values (dry run), leaving
+                the counter state and assignment logs untouched
+        """
+        self.reserve = reserve
+        self.image = cmd['image']
+        self.address = int(cmd['address'], 16) if cmd.get('address') else None
+        self.source = make_source(cmd['source'])
+        self.patch_address = int(cmd['patch'], 16)
+        self.formats = cmd['format'].split(',')
+        check_formats(self.formats)
+
+    def run(self, manager, progress=None):
+        """Allocate values for the unit and program them
+
+        Only the erase sector(s) holding the patch are programmed when the
+        rest of the base image is already on the target; otherwise the whole
+        patched image is programmed.
+
+        Args:
+            manager: Connected OpenOCDManager instance
+            progress: Dict kept across resumes, so a resumed step reuses the
+                values it already allocated
+
+        Returns:
+            str: Result message
+        """
+        device = get_device(manager.target_cfg)
+        if not device:
+            raise SerializationError(f"Serialization requires a known target family, got {manager.target_cfg}")
+        base_address = self.address if self.address is not None else device['flash_base']
+
+        if progress is None:
+            progress = {}
+        if 'values' not in progress:
+            allocate = self.source.allocate if self.reserve else self.source.preview
+            # Values that cannot be rendered are never reserved
+            progress['values'] = allocate(manager, lambda values: render(values, self.formats))
+        values = progress['values']
+
+        view = PatchedImage(self.image, base_address)
+        patch = render(values, self.formats)
+        view.patch(self.patch_address, patch)
+        shown = ', '.join(str(v) if not isinstance(v, bytes) else v.hex() for v in values)
+        out.info(f"Serializing unit: {shown}" + ("" if self.reserve else " (preview, not reserved)"))
+
+        first = sector_bounds(device, self.patch_address)
+        last = sector_bounds(device, self.patch_address + len(patch) - 1)
+        if first and last and view.base_address <= first[0] and last[1] <= view.end:
+            region_start, region_end = first[0], last[1]
+            # Base present = everything outside the patch sectors matches
+            rest = [(view.base_address, region_start), (region_end, view.end)]
+            if all(manager.image_bytes_present(view.read(start, end), start)
+                   for start, end in rest if start < end):
+                manager.program_bytes(view.read(region_start, region_end), region_start)
+                response = f"Base image present, programmed patch sector(s) 0x{region_start:08x}-0x{region_end:08x}"
+                out.success(response)
+                return response
+
+        manager.program_bytes(view.read(view.base_address, view.end), view.base_address)
+        response = f"Programmed patched image at 0x{view.base_address:08x} ({len(view.base)} bytes)"
+        out.success(response)
+        return response
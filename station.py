@@ -0,0 +1,179 @@
+"""Production Station - Continuous board-insert detection and auto-run loop"""
+
+import time
+from collections import Counter, defaultdict
+from colors import Colors, error, success
+from output import out
+
+# Upper bounds (seconds) of the step timing histogram buckets
+HISTOGRAM_BUCKETS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, float('inf')]
+
+
+def wait_for_presence(manager, present, poll_interval=0.2, debounce=3, timeout=None):
+    """Poll a probe until a board is inserted (present=True) or removed
+
+    Args:
+        manager: OpenOCDManager of the probe
+        present: True to wait for an insert, False for a removal
+        poll_interval: Seconds between presence polls
+        debounce: Consecutive polls required to accept the change
+        timeout: Seconds to wait before giving up, or None to wait forever
+
+    Returns:
+        int: IDCODE of the inserted board, or None after a removal
+
+    Raises:
+        TimeoutError: If the board did not change within the timeout
+    """
+    deadline = time.time() + timeout if timeout is not None else None
+    streak = 0
+    while True:
+        if deadline is not None and time.time() > deadline:
+            raise TimeoutError("Board was not " + ("inserted" if present else "removed")
+                               + f" within {timeout:g}s")
+        if not manager.connected and not manager.reconnect():
+            time.sleep(1)
+            continue
+
+        idcode = manager.read_idcode()
+        if (idcode is not None) == present:
+            streak += 1
+            if streak >= debounce:
+                return idcode
+        else:
+            streak = 0
+        time.sleep(poll_interval)
+
+
+class StationStats:
+    """Throughput, step timing and failure statistics of a station session"""
+
+    def __init__(self):
+        self.start_time = time.time()
+        self.passed = 0
+        self.failed = 0
+        self.step_times = defaultdict(list)
+        self.failures = Counter()
+
+    def record_board(self, passed, timings):
+        """Record the result of one board
+
+        Args:
+            passed: True if every command succeeded
+            timings: List of (command type, seconds, passed) tuples
+        """
+        if passed:
+            self.passed += 1
+        else:
+            self.failed += 1
+
+        for cmd_type, seconds, step_passed in timings:
+            self.step_times[cmd_type].append(seconds)
+            if not step_passed:
+                self.failures[cmd_type] += 1
+
+    @property
+    def boards(self):
+        return self.passed + self.failed
+
+    def boards_per_hour(self):
+        """Boards per hour since the station was started"""
+        elapsed = time.time() - self.start_time
+        return self.boards * 3600 / elapsed if elapsed > 0 else 0.0
+
+    def print_counters(self):
+        """Print the one-line live counters"""
+        out.info(f"Boards: {self.boards} | {Colors.SUCCESS}passed: {self.passed}{Colors.INFO} | "
+                 f"{Colors.ERROR}failed: {self.failed}{Colors.INFO} | "
+                 f"{self.boards_per_hour():.1f} boards/hour")
+
+    def print_summary(self):
+        """Print counters, per-step timing histograms and the failure tally"""
+        out.header("\n" + "=" * 50)
+        out.header("Station Summary")
+        out.header("=" * 50)
+        self.print_counters()
+
+        for cmd_type, times in self.step_times.items():
+            out.info(f"\n{cmd_type}: n={len(times)} avg={sum(times) / len(times):.2f}s "
+                     f"min={min(times):.2f}s max={max(times):.2f}s")
+            counts = [0] * len(HISTOGRAM_BUCKETS)
+            for seconds in times:
+                for index, bound in enumerate(HISTOGRAM_BUCKETS):
+                    if seconds <= bound:
+                        counts[index] += 1
+                        break
+            peak = max(counts)
+            for bound, count in zip(HISTOGRAM_BUCKETS, counts):
+                if count:
+                    label = f"<= {bound:g}s" if bound != float('inf') else f"> {HISTOGRAM_BUCKETS[-2]:g}s"
+                    bar = "#" * max(1, round(30 * count / peak))
+                    out.plain(f"  {label:>9} {bar} {count}")
+
+        if self.failures:
+            out.error("\nFailures by step:")
+            for cmd_type, count in self.failures.most_common():
+                out.error(f"  {cmd_type}: {count}")
+
+
+class ProductionStation:
+    """Keep OpenOCD warm and run the config on every inserted board"""
+
+    def __init__(self, manager, commands, executor, poll_interval=0.2, debounce=3):
+        """
+        Args:
+            manager: Connected OpenOCDManager instance
+            commands: List of command dictionaries to run per board
+            executor: Callable (manager, commands, timings) returning 0 on success
+            poll_interval: Seconds between presence polls
+            debounce: Consecutive polls required to accept an insert or removal
+        """
+        self.manager = manager
+        self.commands = commands
+        self.executor = executor
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.stats = StationStats()
+
+    def run(self):
+        """Run the station loop until interrupted with Ctrl+C
+
+        Returns:
+            int: 0 if no board failed, 1 otherwise
+        """
+        out.header("\nProduction station mode - press Ctrl+C to stop")
+        try:
+            while True:
+                out.info("\nWaiting for board...")
+                idcode = self._wait_for_presence(True)
+                # Read once per board, for the flash history and serialization logs
+                uid = self.manager.read_chip_uid()
+                out.success(f"Board detected (IDCODE 0x{idcode:08x}" + (f", UID {uid})" if uid else ")"))
+                # Cached flash contents belong to the previous board
+                self.manager.invalidate_read_cache()
+
+                timings = []
+                start = time.time()
+                result = self.executor(self.manager, self.commands, timings)
+                self.stats.record_board(result == 0, timings)
+
+                status = success("PASSED") if result == 0 else error("FAILED")
+                out.info(f"Board #{self.stats.boards} {status}{Colors.INFO} in {time.time() - start:.1f}s")
+                self.stats.print_counters()
+
+                out.info("Remove board...")
+                self._wait_for_presence(False)
+                self.manager.chip_uid = None
+        except KeyboardInterrupt:
+            out.warning("\n\nStation stopped by user")
+
+        self.stats.print_summary()
+        return 0 if self.stats.failed == 0 else 1
+
+    def _wait_for_presence(self, present):
+        """Poll until a board is inserted (present=True) or removed
+
+        Returns:
+            int: IDCODE of the inserted board, or None after a removal
+        """
+        return wait_for_presence(self.manager, present, self.poll_interval, self.debounce)
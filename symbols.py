@@ -0,0 +1,291 @@
+"""Symbol Index - Resolves ELF symbol names to target addresses"""
+
+import bisect
+import hashlib
+import os
+import pickle
+import re
+import struct
+from output import out
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".openocd_automation", "symbols")
+
+# Bump when the cached index layout or member resolution changes
+CACHE_VERSION = 2
+
+SHT_SYMTAB = 2
+STT_OBJECT = 1
+STT_FUNC = 2
+STB_GLOBAL = 1
+
+# int(text, 16) alone would also accept '_' separators and read names
+# such as 'add_cb' as addresses
+ADDRESS_PATTERN = re.compile(r"(0[xX])?[0-9a-fA-F]+")
+
+
+class SymbolError(LookupError):
+    """Raised when a symbol cannot be resolved"""
+
+
+def _file_hash(path):
+    """Return the SHA-256 of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def parse_elf_symbols(path):
+    """Read the data and function symbols from the .symtab of an ELF file
+
+    Returns:
+        list: (name, address, size, is_global) tuples
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if data[:4] != b"\x7fELF":
+        raise SymbolError(f"{path} is not an ELF file")
+    is_64 = data[4] == 2
+    endian = '<' if data[5] == 1 else '>'
+
+    if is_64:
+        shoff, = struct.unpack_from(endian + 'Q', data, 0x28)
+        shentsize, shnum = struct.unpack_from(endian + 'HH', data, 0x3A)
+        section_fmt = endian + 'IIQQQQIIQQ'
+        symbol_fmt = endian + 'IBBHQQ'
+    else:
+        shoff, = struct.unpack_from(endian + 'I', data, 0x20)
+        shentsize, shnum = struct.unpack_from(endian + 'HH', data, 0x2E)
+        section_fmt = endian + 'IIIIIIIIII'
+        symbol_fmt = endian + 'IIIBBH'
+
+    sections = [struct.unpack_from(section_fmt, data, shoff + i * shentsize) for i in range(shnum)]
+
+    symbols = []
+    for section in sections:
+        # name, type, flags, addr, offset, size, link, info, addralign, entsize
+        if section[1] != SHT_SYMTAB:
+            continue
+        offset, size, link = section[4], section[5], section[6]
+        strtab = sections[link]
+        strings = data[strtab[4]:strtab[4] + strtab[5]]
+
+        for entry in struct.iter_unpack(symbol_fmt, data[offset:offset + size]):
+            if is_64:
+                name_offset, sym_info, _, shndx, value, sym_size = entry
+            else:
+                name_offset, value, sym_size, sym_info, _, shndx = entry
+            if shndx == 0 or (sym_info & 0xF) not in (STT_OBJECT, STT_FUNC):
+                continue
+            end = strings.index(b"\0", name_offset)
+            name = strings[name_offset:end].decode('ascii', 'replace')
+            symbols.append((name, value, sym_size, (sym_info >> 4) == STB_GLOBAL))
+    return symbols
+
+
+class SymbolIndex:
+    """Sorted symbol table of an ELF file, built lazily and cached on disk
+
+    The table is parsed on the first lookup and stored in the cache keyed by
+    the ELF hash, so unchanged ELF files are never parsed twice. Lookups are
+    binary searches over the sorted names.
+    """
+
+    def __init__(self, elf_path, cache_dir=DEFAULT_CACHE_DIR):
+        self.elf_path = elf_path
+        self.cache_dir = cache_dir
+        self._names = None
+        self._addresses = None
+        self._sizes = None
+        self._members = {}
+        self._cache_path = None
+
+    def _ensure_loaded(self):
+        """Load the index from the cache or parse the ELF file"""
+        if self._names is not None:
+            return
+        if not os.path.exists(self.elf_path):
+            raise FileNotFoundError(f"ELF file '{self.elf_path}' not found")
+
+        self._cache_path = os.path.join(self.cache_dir, f"{_file_hash(self.elf_path)}.pickle")
+        try:
+            with open(self._cache_path, 'rb') as f:
+                version, self._names, self._addresses, self._sizes, self._members = pickle.load(f)
+            if version == CACHE_VERSION:
+                return
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+            pass
+
+        out.info(f"Indexing symbols of {self.elf_path}...")
+        # Global symbols sort first, so a name shared with file-local
+        # statics resolves to the global one
+        symbols = sorted(parse_elf_symbols(self.elf_path), key=lambda s: (s[0], not s[3]))
+        self._names, self._addresses, self._sizes = [], [], []
+        for name, address, size, _ in symbols:
+            if self._names and self._names[-1] == name:
+                continue
+            self._names.append(name)
+            self._addresses.append(address)
+            self._sizes.append(size)
+        self._members = {}
+        self._save()
+
+    def _save(self):
+        """Write the index to the cache (best effort)"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{self._cache_path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((CACHE_VERSION, self._names, self._addresses, self._sizes, self._members),
+                            f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._cache_path)
+        except OSError as e:
+            out.warning(f"Could not write symbol cache: {e}")
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._names)
+
+    def lookup(self, name):
+        """Resolve a symbol or 'symbol.member' path
+
+        Args:
+            name: Symbol name, optionally followed by struct member names
+
+        Returns:
+            tuple: (address, size in bytes)
+
+        Raises:
+            SymbolError: If the symbol or member does not exist
+        """
+        self._ensure_loaded()
+        # GCC names static locals and LTO symbols 'counter.0' or
+        # 'buf.lto_priv.0', so the longest matching symbol wins and only the
+        # rest is a member path
+        parts = name.split('.')
+        for split in range(len(parts), 0, -1):
+            base = '.'.join(parts[:split])
+            index = bisect.bisect_left(self._names, base)
+            if index < len(self._names) and self._names[index] == base:
+                break
+        else:
+            raise SymbolError(f"Symbol '{parts[0]}' not found in {self.elf_path}")
+        address, size = self._addresses[index], self._sizes[index]
+        member_path = '.'.join(parts[split:])
+
+        if not member_path:
+            return address, size
+        if name not in self._members:
+            self._members[name] = self._resolve_member(base, member_path.split('.'))
+            self._save()
+        offset, size = self._members[name]
+        return address + offset, size
+
+    def _resolve_member(self, variable, members):
+        """Find the offset and size of a struct member using DWARF info
+
+        Returns:
+            tuple: (offset from the variable start, member size)
+        """
+        try:
+            from elftools.elf.elffile import ELFFile
+        except ImportError:
+            raise SymbolError("Resolving struct members requires pyelftools (pip install pyelftools)")
+
+        with open(self.elf_path, 'rb') as f:
+            elf = ELFFile(f)
+            if not elf.has_dwarf_info():
+                raise SymbolError(f"{self.elf_path} has no DWARF debug info")
+
+            for cu in elf.get_dwarf_info().iter_CUs():
+                for die in cu.iter_DIEs():
+                    if die.tag != 'DW_TAG_variable' or 'DW_AT_type' not in die.attributes:
+                        continue
+                    if die.attributes.get('DW_AT_name') and \
+                            die.attributes['DW_AT_name'].value.decode() == variable:
+                        return self._walk_members(die.get_DIE_from_attribute('DW_AT_type'), members)
+        raise SymbolError(f"No debug info for variable '{variable}'")
+
+    def _walk_members(self, type_die, members):
+        """Follow a member path through DWARF struct types"""
+        offset = 0
+        for member in members:
+            type_die = self._strip_qualifiers(type_die)
+            for child in type_die.iter_children():
+                name = child.attributes.get('DW_AT_name')
+                if child.tag == 'DW_TAG_member' and name and name.value.decode() == member:
+                    offset += self._member_offset(child)
+                    type_die = child.get_DIE_from_attribute('DW_AT_type')
+                    break
+            else:
+                raise SymbolError(f"Member '{member}' not found")
+
+        size = self._strip_qualifiers(type_die).attributes.get('DW_AT_byte_size')
+        return offset, size.value if size else 0
+
+    def _member_offset(self, member_die):
+        """Return the byte offset of a struct member
+
+        DWARF 4+ stores a constant; DWARF 2/3 (-gdwarf-2, older
+        arm-none-eabi-gcc) store a location expression, normally a single
+        DW_OP_plus_uconst.
+
+        Raises:
+            SymbolError: If the location cannot be evaluated
+        """
+        location = member_die.attributes.get('DW_AT_data_member_location')
+        if location is None:
+            # Union members (and bit fields in some producers) start at 0
+            return 0
+        if isinstance(location.value, int):
+            return location.value
+
+        from elftools.dwarf.dwarf_expr import DWARFExprParser
+        name = member_die.attributes['DW_AT_name'].value.decode()
+        try:
+            operations = DWARFExprParser(member_die.cu.structs).parse_expr(location.value)
+        except Exception as e:
+            raise SymbolError(f"Cannot parse the location of member '{name}': {e}")
+        if len(operations) == 1 and operations[0].op_name == 'DW_OP_plus_uconst':
+            return operations[0].args[0]
+        raise SymbolError(f"Unsupported location expression for member '{name}': "
+                          + " ".join(operation.op_name for operation in operations))
+
+    def _strip_qualifiers(self, type_die):
+        """Skip typedefs and const/volatile qualifiers"""
+        while type_die.tag in ('DW_TAG_typedef', 'DW_TAG_const_type', 'DW_TAG_volatile_type'):
+            type_die = type_die.get_DIE_from_attribute('DW_AT_type')
+        return type_die
+
+
+def parse_address(text, symbols=None):
+    """Parse a hex address or a symbol name
+
+    When an ELF file is loaded, an exact symbol match wins over a name that
+    also reads as hex (e.g. 'cafe'); a 0x prefix always means an address.
+
+    Args:
+        text: Hex address (e.g. '0x20000000') or symbol name (e.g. 'cal.offset')
+        symbols: SymbolIndex used for names, or None
+
+    Returns:
+        tuple: (address, size in bytes or None)
+
+    Raises:
+        ValueError: If the text is neither a hex address nor a known symbol
+    """
+    is_address = ADDRESS_PATTERN.fullmatch(text) is not None
+    # Identifiers cannot start with a digit, so those never need the ELF
+    if symbols is not None and not text[:1].isdigit():
+        try:
+            return symbols.lookup(text)
+        except (SymbolError, FileNotFoundError) as e:
+            if not is_address:
+                raise ValueError(str(e))
+    if is_address:
+        return int(text, 16), None
+    if symbols is None:
+        raise ValueError(f"Invalid address '{text}' (load an ELF file to use symbol names)")
+    raise ValueError(f"Invalid address '{text}'")
@@ -0,0 +1,20 @@
+"""Prometheus text rendering of the metrics registry"""
+
+from metrics import MetricsRegistry
+
+
+def test_values_keep_full_precision():
+    registry = MetricsRegistry()
+    registry.describe('flash_bytes_total', 'counter', 'Bytes programmed')
+    registry.describe('flash_seconds_total', 'counter', 'Seconds spent programming')
+    registry.inc('flash_bytes_total', 3331719)
+    registry.inc('flash_seconds_total', 12.3456789)
+    lines = registry.prometheus_text().splitlines()
+    assert "flash_bytes_total 3331719" in lines
+    assert "flash_seconds_total 12.3456789" in lines
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.inc('openocd_commands_total', command='say "hi"\\\n')
+    assert 'openocd_commands_total{command="say \\"hi\\"\\\\\\n"} 1' in registry.prometheus_text()
@@ -0,0 +1,44 @@
+"""SymbolIndex lookups against ELF files built with the host gcc"""
+
+import shutil
+import subprocess
+
+import pytest
+
+from symbols import SymbolIndex, parse_elf_symbols
+
+pytest.importorskip("elftools")
+pytestmark = pytest.mark.skipif(shutil.which("gcc") is None, reason="gcc not installed")
+
+SOURCE = """
+struct calibration { int gain; int offset; struct { short lo, hi; } range; };
+struct calibration cal = {1, 2, {3, 4}};
+int next_id(void) { static int counter; return ++counter; }
+int main(void) { return cal.offset + next_id(); }
+"""
+
+
+def build(tmp_path, *flags):
+    source = tmp_path / "firmware.c"
+    source.write_text(SOURCE)
+    elf = tmp_path / "firmware.elf"
+    subprocess.run(["gcc", "-O0", *flags, "-o", str(elf), str(source)], check=True)
+    return SymbolIndex(str(elf), cache_dir=str(tmp_path / "cache"))
+
+
+# DWARF 2/3 store member offsets as DW_OP_plus_uconst expressions, DWARF 4+ as constants
+@pytest.mark.parametrize("dwarf", ["-gdwarf-2", "-gdwarf-3", "-gdwarf-4"])
+def test_member_offsets(tmp_path, dwarf):
+    index = build(tmp_path, dwarf)
+    base, size = index.lookup("cal")
+    assert size == 12
+    assert index.lookup("cal.offset") == (base + 4, 4)
+    assert index.lookup("cal.range.hi") == (base + 10, 2)
+
+
+def test_dotted_symbol_names(tmp_path):
+    index = build(tmp_path, "-g")
+    # GCC names the static local 'counter.0' (or 'counter.<n>' on older versions)
+    name, address, size, _ = next(symbol for symbol in parse_elf_symbols(index.elf_path)
+                                  if symbol[0].startswith("counter."))
+    assert index.lookup(name) == (address, size)
@@ -0,0 +1,89 @@
+"""Transport - Command channel between OpenOCDManager and OpenOCD"""
+
+import socket
+import time
+
+
+class TelnetTransport:
+    """Telnet session to a running OpenOCD process"""
+
+    # OpenOCD must be started before connecting
+    requires_openocd = True
+
+    def __init__(self, host="localhost", port=4444):
+        self.host = host
+        self.port = port
+        self.socket = None
+        self.connected = False
+        self.buffer = b""
+
+    def connect(self):
+        """Open the session and read the initial prompt
+
+        Raises:
+            OSError: If OpenOCD cannot be reached
+        """
+        try:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.socket.settimeout(5)
+            self.socket.connect((self.host, self.port))
+
+            # Read initial prompt
+            self._read_until(b">", timeout=2)
+            self.connected = True
+        except Exception:
+            self.close()
+            raise
+
+    def _read_until(self, delimiter, timeout=5):
+        """Read from socket until delimiter is found"""
+        self.socket.settimeout(timeout)
+        start_time = time.time()
+
+        while time.time() - start_time < timeout:
+            try:
+                data = self.socket.recv(4096)
+                if not data:
+                    # OpenOCD closed the session
+                    self.connected = False
+                    break
+                self.buffer += data
+                if delimiter in self.buffer:
+                    result, self.buffer = self.buffer.split(delimiter, 1)
+                    return result + delimiter
+            except socket.timeout:
+                break
+            except Exception:
+                self.connected = False
+                break
+
+        result = self.buffer
+        self.buffer = b""
+        return result
+
+    def send(self, command, timeout=5):
+        """Send a command and wait for the prompt
+
+        Returns:
+            str: Response without the prompt, or None if the session was lost
+        """
+        try:
+            self.socket.sendall(f"{command}\n".encode('ascii'))
+            response = self._read_until(b">", timeout=timeout).decode('ascii')
+        except Exception:
+            self.connected = False
+            raise
+        if not self.connected:
+            return None
+        # Remove the prompt from response
+        return response.rsplit('>', 1)[0].strip()
+
+    def close(self):
+        if self.socket:
+            try:
+                self.socket.close()
+            except OSError:
+                pass
+        self.socket = None
+        self.connected = False
+        self.buffer = b""
@@ -2,6 +2,7 @@
 
 import time
 from colors import Colors, header, error, success, info, warning
+from symbols import parse_address
 
 
 # STM32 target configurations
@@ -110,23 +111,24 @@ def run_interactive_loop(manager):
 
             elif choice == "7":
                 try:
-                    addr_str = input(f"{Colors.PROMPT}Enter memory address (hex, e.g., 0x08000000): {Colors.RESET}").strip()
-                    address = int(addr_str, 16) if addr_str.startswith("0x") else int(addr_str, 16)
-                    count_str = input(f"{Colors.PROMPT}Enter number of words to read (default: 1): {Colors.RESET}").strip()
-                    count = int(count_str) if count_str else 1
+                    addr_str = input(f"{Colors.PROMPT}Enter memory address (hex, e.g., 0x08000000, or symbol): {Colors.RESET}").strip()
+                    address, size = parse_address(addr_str, manager.symbols)
+                    default_count = max(1, -(-(size or 0) // 4))
+                    count_str = input(f"{Colors.PROMPT}Enter number of words to read (default: {default_count}): {Colors.RESET}").strip()
+                    count = int(count_str) if count_str else default_count
                     manager.read_memory(address, count)
-                except ValueError:
-                    print(error("Invalid address or count"))
+                except ValueError as e:
+                    print(error(f"Invalid address or count: {e}"))
 
             elif choice == "8":
                 try:
-                    addr_str = input(f"{Colors.PROMPT}Enter memory address (hex, e.g., 0x08000000): {Colors.RESET}").strip()
-                    address = int(addr_str, 16) if addr_str.startswith("0x") else int(addr_str, 16)
+                    addr_str = input(f"{Colors.PROMPT}Enter memory address (hex, e.g., 0x08000000, or symbol): {Colors.RESET}").strip()
+                    address, _ = parse_address(addr_str, manager.symbols)
                     val_str = input(f"{Colors.PROMPT}Enter value to write (hex, e.g., 0x12345678): {Colors.RESET}").strip()
                     value = int(val_str, 16) if val_str.startswith("0x") else int(val_str, 16)
                     manager.write_memory(address, value)
-                except ValueError:
-                    print(error("Invalid address or value"))
+                except ValueError as e:
+                    print(error(f"Invalid address or value: {e}"))
 
             elif choice == "9":
                 manager.get_target_info()